@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare converting a DataFrame to NGSI entities row by row and column by column
+
+python benchmarks/bench_dataframe.py [count]
+"""
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+from pyngsi.ngsi import DataModel
+from pyngsi.template import EntityTemplate
+from pyngsi.sources.more_sources import SourceDataFrame, SourceDataFrameNgsi
+
+
+def build_dataframe(count: int) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "id": [f"urn:ngsi-ld:Room:{i}" for i in range(count)],
+        "temperature": rng.uniform(-10, 40, count).round(1),
+        "pressure": rng.integers(700, 1000, count),
+        "date": pd.date_range("2021-07-23", periods=count, freq="s"),
+        "lat": rng.uniform(-90, 90, count),
+        "lon": rng.uniform(-180, 180, count),
+    })
+
+
+def row_by_row(df: pd.DataFrame) -> int:
+    n = 0
+    for row in SourceDataFrame(df):
+        r = row.record
+        m = DataModel(id=r.id, type="Room")
+        m.add("temperature", r.temperature)
+        m.add("pressure", int(r.pressure))
+        m.add("dateObserved", r.date.to_pydatetime())
+        m.add("location", (r.lat, r.lon))
+        m.json()
+        n += 1
+    return n
+
+
+def column_by_column(df: pd.DataFrame) -> int:
+    tpl = EntityTemplate("Room")
+    tpl.add("temperature", "Number")
+    tpl.add("pressure", "Number")
+    tpl.add("dateObserved", "DateTime")
+    tpl.add("location", "geo:json")
+    src = SourceDataFrameNgsi(df, tpl, id="id", batch_size=100000,
+                              columns={"dateObserved": "date", "location": ("lat", "lon")})
+    return sum(len(batch) for batch in src.batches())
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    df = build_dataframe(count)
+    for name, func in (("row by row", row_by_row), ("column by column", column_by_column)):
+        start = time.perf_counter()
+        n = func(df)
+        print(f"{name:20}{time.perf_counter() - start:8.3f}s  {n} entities")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Open file descriptors and peak memory when reading many files
+
+Compares opening all the files up front (SourceMany of Source.from_file) with Source.from_files.
+
+python benchmarks/bench_files.py [count]
+"""
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+import tracemalloc
+
+from loguru import logger
+
+from pyngsi.sources.source import Source, SourceMany
+
+
+def write_files(directory: str, count: int):
+    for i in range(count):
+        with open(os.path.join(directory, f"file{i}.json"), "w") as f:
+            json.dump([{"id": f"Room{i}-{j}", "temperature": 21.5} for j in range(20)], f)
+
+
+def open_fds() -> int:
+    return len(os.listdir("/proc/self/fd"))
+
+
+def eager(filenames):
+    return SourceMany([Source.from_file(f) for f in filenames])
+
+
+def lazy(filenames):
+    return Source.from_files(filenames)
+
+
+def measure(source, filenames):
+    tracemalloc.start()
+    fds = open_fds()
+    try:
+        src = source(filenames)
+        n, peak_fds = 0, 0
+        for _ in src:
+            n += 1
+            if n == 1:
+                peak_fds = open_fds() - fds
+        result = f"{n} rows  open files {peak_fds}"
+    except Exception as e:
+        result = f"failed : {e}"
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return f"{result}  peak {peak/2**20:.1f} MiB"
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    logger.remove()
+    directory = tempfile.mkdtemp()
+    try:
+        write_files(directory, count)
+        filenames = [os.path.join(directory, f) for f in os.listdir(directory)]
+        print(f"{count} files")
+        for name, source in (("eager", eager), ("lazy", lazy)):
+            print(f"{name:8}{measure(source, filenames)}")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the JSON serialization backends of DataModel.json()
+
+python benchmarks/bench_json.py [count]
+"""
+
+import sys
+import json
+import timeit
+
+from datetime import datetime
+
+from pyngsi.ngsi import DataModel
+from pyngsi.utils import jsonbackend
+
+
+def build_entity(i: int) -> DataModel:
+    m = DataModel(id=f"urn:ngsi-ld:AirQualityObserved:{i}",
+                  type="AirQualityObserved")
+    m.add("dateObserved", datetime(2021, 7, 23, 12, i % 60))
+    m.add("location", (44.8333, -0.5667))
+    m.add("NO2", 22.5, metadata={"unitCode": {"value": "GQ"}})
+    m.add("CO", 500, metadata={"unitCode": {"value": "GP"}})
+    m.add("source", "http://datos.madrid.es", isurl=True)
+    m.add("refPointOfInterest", "Plaza de España")
+    return m
+
+
+def legacy_dumps(m: DataModel) -> str:
+    return json.dumps(m, default=m.serializer, ensure_ascii=False)
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    entities = [build_entity(i) for i in range(count)]
+
+    def run(dumps):
+        for m in entities:
+            dumps(m)
+
+    reference = timeit.timeit(lambda: run(legacy_dumps), number=1)
+    print(f"{'json.dumps (legacy)':24}{reference:8.3f}s")
+    for name in jsonbackend.available_backends():
+        dumps = jsonbackend.get_backend(name)
+        elapsed = timeit.timeit(
+            lambda: run(lambda m: dumps(m, m.serializer)), number=1)
+        print(f"{name:24}{elapsed:8.3f}s  x{reference/elapsed:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare loading a JSON array at once and streaming its elements
+
+python benchmarks/bench_json_stream.py [count]
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import tracemalloc
+
+from pyngsi.sources.source_json import SourceJson, SourceJsonStream
+
+
+def write_file(count: int) -> str:
+    fd, filename = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w") as f:
+        f.write('{"data": [')
+        for i in range(count):
+            if i:
+                f.write(",")
+            json.dump({"id": f"Room{i}", "temperature": 21.5, "pressure": 720,
+                       "tags": ["a", "b"]}, f)
+        f.write("]}")
+    return filename
+
+
+def with_load(filename: str):
+    with open(filename) as f:
+        yield from SourceJson(json.load(f), jsonpath="data")
+
+
+def with_stream(filename: str):
+    with open(filename) as f:
+        yield from SourceJsonStream(f, jsonpath="data")
+
+
+def measure(source, filename: str):
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = source(filename)
+    next(rows)
+    first = time.perf_counter() - start
+    n = 1 + sum(1 for _ in rows)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return n, first, elapsed, peak
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    filename = write_file(count)
+    try:
+        print(f"file size {os.path.getsize(filename)/2**20:.1f} MiB")
+        for name, source in (("json.load", with_load), ("stream", with_stream)):
+            n, first, elapsed, peak = measure(source, filename)
+            print(f"{name:12}{n} rows  first row {first*1000:9.1f}ms  total {elapsed:7.2f}s  peak {peak/2**20:8.1f} MiB")
+    finally:
+        os.remove(filename)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare the memory footprint of DataModel and CompactDataModel
+
+python benchmarks/bench_memory_datamodel.py [count]
+"""
+
+import sys
+import gc
+import tracemalloc
+
+from pyngsi.ngsi import DataModel, CompactDataModel
+
+
+def build_entities(klass, count: int):
+    entities = []
+    for i in range(count):
+        m = klass(id=f"urn:ngsi-ld:Room:{i}", type="Room")
+        m.add("temperature", 21.5)
+        m.add("pressure", 720 + i % 100)
+        m.add("occupied", i % 2 == 0)
+        m.add_date("dateObserved", "2021-07-23T12:00:00Z")
+        m.add("location", (44.8333, -0.5667))
+        m.add_relationship("refBuilding", "urn:ngsi-ld:Building", "B1")
+        entities.append(m)
+    return entities
+
+
+def measure(klass, count: int) -> int:
+    gc.collect()
+    tracemalloc.start()
+    entities = build_entities(klass, count)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del entities
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    reference = measure(DataModel, count)
+    print(f"{'DataModel':20}{reference/2**20:10.1f} MiB  {reference/count:6.0f} B/entity")
+    compact = measure(CompactDataModel, count)
+    print(f"{'CompactDataModel':20}{compact/2**20:10.1f} MiB  {compact/count:6.0f} B/entity  -{100*(1-compact/reference):.0f}%")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark suite of the agent pipeline
+
+Runs every benchmark for every data size and writes the results as JSON, to compare them between commits.
+
+python benchmarks/bench_suite.py [--sizes 1000 10000] [--repeat 3] [--only agent] [--output results.json]
+python benchmarks/bench_suite.py --compare before.json after.json
+"""
+
+import io
+import os
+import sys
+import atexit
+import json
+import time
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import openpyxl
+
+from loguru import logger
+
+from pyngsi.ngsi import DataModel
+from pyngsi.sink import SinkNull, SinkOrion, SinkOrionBatch
+from pyngsi.sources.source import Row, SourceStream
+from pyngsi.sources.source_json import SourceJson, SourceJsonStream
+from pyngsi.sources.more_sources import SourceMicrosoftExcel
+from pyngsi.agent import NgsiAgentPull
+from pyngsi.__init__ import __version__
+
+
+def build_entity(row: Row) -> DataModel:
+    id, temperature, pressure = row.record.split(";")
+    m = DataModel(id=id, type="Room")
+    m.add("dateObserved", datetime(2021, 7, 23, 12, 0))
+    m.add("temperature", float(temperature))
+    m.add("pressure", int(pressure))
+    m.add("location", (44.8333, -0.5667))
+    return m
+
+
+def lines(n: int):
+    return [f"Room{i};{20 + i % 10}.5;{700 + i % 100}" for i in range(n)]
+
+
+class StubOrion(BaseHTTPRequestHandler):
+    """Accepts any POST as Orion would"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(201 if self.path.startswith("/v2/entities") else 204)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+# each benchmark returns a function to time, given the data size
+
+def bench_datamodel_build(n: int):
+    rows = [Row("bench", line) for line in lines(n)]
+    return lambda: [build_entity(row) for row in rows]
+
+
+def bench_datamodel_json(n: int):
+    entities = [build_entity(Row("bench", line)) for line in lines(n)]
+    return lambda: [m.json() for m in entities]
+
+
+def bench_source_stream(n: int):
+    text = "\n".join(lines(n)) + "\n"
+    return lambda: sum(1 for _ in SourceStream(io.StringIO(text)))
+
+
+def bench_source_json(n: int):
+    data = [{"id": f"Room{i}", "temperature": 21.5} for i in range(n)]
+    return lambda: sum(1 for _ in SourceJson(data))
+
+
+def bench_source_json_stream(n: int):
+    text = json.dumps([{"id": f"Room{i}", "temperature": 21.5} for i in range(n)])
+    return lambda: sum(1 for _ in SourceJsonStream(io.StringIO(text)))
+
+
+def bench_source_excel(n: int):
+    f = tempfile.NamedTemporaryFile(suffix=".xlsx", delete=False)
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    for line in lines(n):
+        ws.append(line.split(";"))
+    wb.save(f.name)
+    atexit.register(os.remove, f.name)
+    return lambda: sum(1 for _ in SourceMicrosoftExcel(f.name))
+
+
+def bench_agent(n: int):
+    text = "\n".join(lines(n)) + "\n"
+
+    def run():
+        agent = NgsiAgentPull(SourceStream(io.StringIO(text)),
+                              SinkNull(), process=build_entity)
+        agent.run()
+        assert agent.stats.output == n
+    return run
+
+
+def _stub_orion():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOrion)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address[1]
+
+
+def bench_sink_orion(n: int):
+    port = _stub_orion()
+    msgs = [build_entity(Row("bench", line)).json() for line in lines(n)]
+
+    def run():
+        sink = SinkOrion(port=port)
+        for msg in msgs:
+            sink.write(msg)
+        sink.close()
+    return run
+
+
+def bench_sink_orion_batch(n: int):
+    port = _stub_orion()
+    msgs = [build_entity(Row("bench", line)).json() for line in lines(n)]
+
+    def run():
+        sink = SinkOrionBatch(port=port, max_latency=None)
+        for msg in msgs:
+            sink.write(msg)
+        sink.close()
+    return run
+
+
+BENCHMARKS = {name[6:]: f for name, f in globals().items()
+              if name.startswith("bench_")}
+# sending one request per entity is slow : smaller sizes
+MAX_SIZE = {"sink_orion": 10000, "source_excel": 100000}
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+                              capture_output=True, text=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(sizes, repeat: int, only: str = None) -> dict:
+    results = []
+    for name, bench in BENCHMARKS.items():
+        if only and only not in name:
+            continue
+        for n in sizes:
+            if n > MAX_SIZE.get(name, n):
+                continue
+            func = bench(n)
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                func()
+                timings.append(time.perf_counter() - start)
+            best = min(timings)
+            results.append({"name": name, "size": n, "seconds": round(best, 6),
+                            "per_second": round(n / best, 1)})
+            print(f"{name:22}{n:>9}{best:10.3f}s{n/best:14.0f}/s", file=sys.stderr)
+    return {"version": __version__, "commit": git_commit(), "date": datetime.now().isoformat(),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "repeat": repeat, "results": results}
+
+
+def compare(before: str, after: str):
+    with open(before) as f:
+        old = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    with open(after) as f:
+        new = {(r["name"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"{'benchmark':22}{'size':>9}{'before':>11}{'after':>11}{'speedup':>9}")
+    for key in new:
+        if key in old:
+            b, a = old[key]["seconds"], new[key]["seconds"]
+            print(f"{key[0]:22}{key[1]:>9}{b:10.3f}s{a:10.3f}s{b/a:8.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", help="run benchmarks whose name contains ONLY")
+    parser.add_argument("--output", help="JSON results file. Defaults to stdout.")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    logger.remove()
+    results = run(args.sizes, args.repeat, args.only)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Compare building JSON entities with DataModel and with a compiled EntityTemplate
+
+python benchmarks/bench_template.py [count]
+"""
+
+import sys
+import timeit
+
+from datetime import datetime
+
+from pyngsi.ngsi import DataModel
+from pyngsi.template import EntityTemplate
+
+NOW = datetime(2021, 7, 23, 12, 0, 0)
+
+
+def with_datamodel(i: int) -> str:
+    m = DataModel(id=f"Room{i}", type="Room")
+    m.add("temperature", 21.5)
+    m.add("pressure", 720)
+    m.add("dateObserved", NOW)
+    m.add("location", (44.8333, -0.5667))
+    m.add_relationship("refBuilding", "urn:ngsi-ld:Building", "B1")
+    return m.json()
+
+
+tpl = EntityTemplate("Room")
+tpl.add("temperature", "Number")
+tpl.add("pressure", "Number")
+tpl.add("dateObserved", "DateTime")
+tpl.add("location", "geo:json")
+tpl.add_relationship("refBuilding")
+build = tpl.compile()
+
+
+def with_template(i: int) -> str:
+    return build(f"Room{i}", 21.5, 720, NOW, (44.8333, -0.5667), "urn:ngsi-ld:Building:B1")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    assert with_datamodel(0) == with_template(0)
+    reference = timeit.timeit(
+        lambda: [with_datamodel(i) for i in range(count)], number=1)
+    print(f"{'DataModel':20}{reference:8.3f}s")
+    elapsed = timeit.timeit(
+        lambda: [with_template(i) for i in range(count)], number=1)
+    print(f"{'EntityTemplate':20}{elapsed:8.3f}s  x{reference/elapsed:.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -2,18 +2,24 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import time
+import threading
+import multiprocessing
 
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from shortuuid import uuid
+from more_itertools import chunked
 from loguru import logger
 from datetime import datetime
-from typing import Callable, Union
+from typing import Any, Callable, List, Tuple, Union
 from abc import ABC, abstractmethod
 
 from pyngsi.sources.source import Row, Source, SourceStream
 from pyngsi.sink import Sink, SinkStdout
-from pyngsi.ngsi import DataModel
+from pyngsi.ngsi import DataModel, BaseDataModel
 from pyngsi.sources.server import Server
+from pyngsi.utils.backpressure import BackpressureQueue, QueueClosed, BLOCK
+from pyngsi.utils.latency import StageLatency, SOURCE_NEXT, PROCESS, SERIALIZE, SINK_WRITE, SIDE_EFFECT
 from pyngsi.__init__ import __version__
 
 
@@ -21,6 +27,29 @@ class NgsiException(Exception):
     pass
 
 
+def _process_row(process: Callable, row: Row, stats: "NgsiAgent.Stats", latency: StageLatency = None) -> Tuple[Any, Any]:
+    """Processes a row into the entity and its serialized message. Returns None when the row is filtered out."""
+    if row.provider is None:
+        row.provider = "user"
+    logger.trace(f"{row.provider=}\t{row.record=}")
+    stats.count("input")
+    if latency:
+        t0 = time.perf_counter()
+        x = process(row)
+        t1 = time.perf_counter()
+        latency.record(PROCESS, t1 - t0)
+    else:
+        x = process(row)
+    if not x:
+        stats.count("filtered")
+        return None
+    stats.count("processed")
+    msg = x.json() if isinstance(x, BaseDataModel) else x
+    if latency:
+        latency.record(SERIALIZE, time.perf_counter() - t1)
+    return x, msg
+
+
 class NgsiAgent(ABC):
 
     """
@@ -66,6 +95,12 @@ class NgsiAgent(ABC):
         """
         pass
 
+    latency: StageLatency = None  # per-stage latency histograms, when profiling is enabled
+
+    def set_profiling(self, enabled: bool = True):
+        """Enable the latency histograms of the stages : source_next, process, serialize, sink_write, side_effect"""
+        self.latency = StageLatency() if enabled else None
+
     @dataclass(eq=True)
     class Stats:
         """
@@ -77,33 +112,99 @@ class NgsiAgent(ABC):
         filtered: int = 0
         error: int = 0
         side_entities: int = 0
+        retries: int = 0  # requests retried by the sink
+        breaker_trips: int = 0  # times the sink circuit breaker opened
+        breaker_open_time: float = 0.0  # seconds spent with the sink circuit breaker open
+        skipped_unchanged: int = 0  # records output but not sent, being unchanged since the last write
+
+        def __post_init__(self):
+            self._lock = threading.Lock()
+
+        def __getstate__(self):
+            state = self.__dict__.copy()
+            del state["_lock"]
+            return state
+
+        def __setstate__(self, state):
+            self.__dict__.update(state)
+            self._lock = threading.Lock()
 
         def __add__(self, o):
-            return NgsiAgent.Stats(self.input + o.input,
-                                   self.processed + o.processed,
-                                   self.output + o.output,
-                                   self.filtered + o.filtered,
-                                   self.error + o.error,
-                                   self.side_entities + o.side_entities)
+            return NgsiAgent.Stats(*(getattr(self, f.name) + getattr(o, f.name) for f in fields(self)))
 
         def __iadd__(self, o):
-            self.input += o.input
-            self.processed += o.processed
-            self.output += o.output
-            self.filtered += o.filtered
-            self.error += o.error
-            self.side_entities += o.side_entities
+            with self._lock:  # servers merge the statistics of concurrent requests
+                for f in fields(self):
+                    setattr(self, f.name, getattr(self, f.name) + getattr(o, f.name))
             return self
 
         def zero(self):
-            self.input = 0
-            self.processed = 0
-            self.output = 0
-            self.filtered = 0
-            self.error = 0
-            self.side_entities = 0
+            for f in fields(self):
+                setattr(self, f.name, f.default)
             return self
 
+        def reject(self, n: int = 1):
+            """Account records output to a sink that eventually failed to deliver them"""
+            with self._lock:
+                self.output -= n
+                self.error += n
+
+        def skip(self, n: int = 1):
+            """Account records output to a sink that skipped them, being unchanged"""
+            with self._lock:
+                self.output -= n
+                self.skipped_unchanged += n
+
+        def count(self, name: str, n: float = 1):
+            """Increment a counter from a thread of the sink"""
+            with self._lock:
+                setattr(self, name, getattr(self, name) + n)
+
+    def feed(self, source: Source, stats: Stats):
+        """Process the rows of the source, accounting them in stats
+
+        Neither binds nor flushes the sink. Hence a server calls it concurrently, its requests sharing the sink.
+        """
+        for row in self._timed(source) if self.latency else source:
+            logger.debug(row)
+            try:
+                if result := _process_row(self.process, row, stats, self.latency):
+                    self._write_row(row, *result, stats)
+            except Exception as e:
+                stats.count("error")
+                logger.error(f"Cannot process record : {e}")
+        return stats
+
+    def _timed(self, source: Source):
+        """Iterates over the source, timing each row"""
+        record, clock = self.latency.record, time.perf_counter
+        rows = iter(source)
+        while True:
+            t0 = clock()
+            try:
+                row = next(rows)
+            except StopIteration:
+                return
+            record(SOURCE_NEXT, clock() - t0)
+            yield row
+
+    def _write_row(self, row: Row, x: Any, msg: Any, stats: Stats):
+        """Writes the message to the sink, then runs the side effect"""
+        if self.latency:
+            t0 = time.perf_counter()
+            self.sink.write(msg)
+            t1 = time.perf_counter()
+            self.latency.record(SINK_WRITE, t1 - t0)
+        else:
+            self.sink.write(msg)
+        stats.count("output")
+        if self.side_effect:
+            side_entities = self.side_effect(row, self.sink, x)
+            if self.latency:
+                self.latency.record(SIDE_EFFECT, time.perf_counter() - t1)
+            stats.count("side_entities", side_entities)
+
+
 class NgsiAgentPull(NgsiAgent):
 
     """
@@ -126,36 +227,23 @@ class NgsiAgentPull(NgsiAgent):
 
     @property
     def status(self):
+        """Returns the statistics, and the latency histograms of the stages when profiling"""
+        if self.latency:
+            return self.stats, self.latency.to_dict()
         return self.stats
 
     def run(self):
         logger.info("start to acquire data")
-        for row in self.source:
-            logger.debug(row)
-            try:
-                if row.provider is None:
-                    row.provider = "user"
-                logger.trace(f"{row.provider=}\t{row.record=}")
-                self.stats.input += 1
-                x = self.process(row)
-                if not x:
-                    self.stats.filtered += 1
-                    continue
-                self.stats.processed += 1
-                msg = x.json() if isinstance(x, DataModel) else x
-                self.sink.write(msg)
-                self.stats.output += 1
-                if self.side_effect:
-                    side_entities = self.side_effect(row, self.sink, x)
-                    self.stats.side_entities += side_entities
-            except Exception as e:
-                self.stats.error += 1
-                logger.error(f"Cannot process record : {e}")
+        self.sink.bind(self.stats)
+        self.feed(self.source, self.stats)
+        self.sink.flush()
         return self
 
     def close(self):
         logger.info("close NGSI agent")
         logger.info(self.status)
+        if self.latency:
+            logger.info(self.latency.to_dict())
         self.source.close()
         logger.info(f"close sink")
         self.sink.close()
@@ -165,6 +253,176 @@ class NgsiAgentPull(NgsiAgent):
         self.stats.zero()
 
 
+class NgsiAgentPipelined(NgsiAgentPull):
+
+    """
+    The NgsiAgentPipelined runs the datasource, the process function and the sink in separate stages.
+
+    A reader thread pulls rows from the datasource, a transformer thread processes them,
+    and the sink is written from the thread calling run().
+    Stages are connected by bounded queues : a slow sink no longer stalls the datasource.
+    When the queue of the reader is full, the backpressure policy applies :
+    block (default), drop-oldest, or spill to disk (see pyngsi.utils.backpressure).
+    The queue of the transformer always blocks : rows are not dropped once processed.
+    Queue depths are reported by status.
+    """
+
+    def __init__(self,
+                 source: Source = None,
+                 sink: Sink = None,
+                 process: Callable = lambda row, *args, **kwargs: row.record,
+                 side_effect: Callable = None,
+                 queue_size: int = 1000,
+                 policy: str = BLOCK,
+                 spill_dir: str = None):
+        super().__init__(source, sink, process, side_effect)
+        self.queue_size = queue_size
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.queues = self._create_queues()
+        logger.info(f"{queue_size=} {policy=} {spill_dir=}")
+
+    def _create_queues(self):
+        return {"read": BackpressureQueue(self.queue_size, self.policy, self.spill_dir),
+                "process": BackpressureQueue(self.queue_size)}
+
+    @property
+    def status(self):
+        return self.stats, {name: q.gauges() for name, q in self.queues.items()}
+
+    def _read(self):
+        q = self.queues["read"]
+        try:
+            for row in self.source:
+                q.put(row)
+        except Exception as e:
+            logger.error(f"Cannot read datasource : {e}")
+        finally:
+            q.close()
+
+    def _transform(self):
+        rows, q = self.queues["read"], self.queues["process"]
+        try:
+            while True:
+                row = rows.get()
+                logger.debug(row)
+                try:
+                    if result := _process_row(self.process, row, self.stats):
+                        q.put((row, *result))
+                except Exception as e:
+                    self.stats.count("error")
+                    logger.error(f"Cannot process record : {e}")
+        except QueueClosed:
+            pass
+        finally:
+            q.close()
+
+    def run(self):
+        logger.info("start to acquire data")
+        self.sink.bind(self.stats)
+        self.queues = self._create_queues()
+        stages = [threading.Thread(target=self._read, daemon=True),
+                  threading.Thread(target=self._transform, daemon=True)]
+        for stage in stages:
+            stage.start()
+        q = self.queues["process"]
+        while True:
+            try:
+                row, x, msg = q.get()
+            except QueueClosed:
+                break
+            try:
+                self._write_row(row, x, msg, self.stats)
+            except Exception as e:
+                self.stats.count("error")
+                logger.error(f"Cannot process record : {e}")
+        for stage in stages:
+            stage.join()
+        self.sink.flush()
+        return self
+
+
+# the process function of the NgsiAgentParallel workers
+_worker_process: Callable = None
+_worker_keep_entity: bool = False
+
+
+def _init_worker(process: Callable, keep_entity: bool):
+    global _worker_process, _worker_keep_entity
+    _worker_process = process
+    _worker_keep_entity = keep_entity
+
+
+def _process_chunk(rows: List[Row]) -> Tuple[List[Tuple[Row, Any, Any]], NgsiAgent.Stats]:
+    stats = NgsiAgent.Stats()
+    results = []
+    for row in rows:
+        try:
+            if not (result := _process_row(_worker_process, row, stats)):
+                continue
+            x, msg = result
+            if _worker_keep_entity:
+                results.append((row, x, msg))
+            else:
+                results.append((None, None, msg))
+        except Exception as e:
+            stats.count("error")
+            logger.error(f"Cannot process record : {e}")
+    return results, stats
+
+
+class NgsiAgentParallel(NgsiAgentPull):
+
+    """
+    The NgsiAgentParallel runs the process function in a pool of worker processes.
+
+    Rows pulled from the datasource are sent by chunks to the workers.
+    Workers return the serialized entities and their own statistics. The sink is written from the main process.
+    When ordered is False, chunks are written as soon as they are processed, in no particular order.
+    The side_effect function, if any, runs in the main process.
+
+    With the spawn start method (i.e. Windows, macOS), the process function must be picklable (i.e. not a lambda).
+    """
+
+    def __init__(self,
+                 source: Source = None,
+                 sink: Sink = None,
+                 process: Callable = lambda row, *args, **kwargs: row.record,
+                 side_effect: Callable = None,
+                 processes: int = None,
+                 chunksize: int = 100,
+                 ordered: bool = True):
+        super().__init__(source, sink, process, side_effect)
+        self.processes = processes if processes else multiprocessing.cpu_count()
+        self.chunksize = chunksize
+        self.ordered = ordered
+        logger.info(f"{self.processes=} {chunksize=} {ordered=}")
+
+    def _chunks(self, inflight: threading.Semaphore):
+        for chunk in chunked(self.source, self.chunksize):
+            inflight.acquire()  # do not read ahead more than needed
+            yield chunk
+
+    def run(self):
+        logger.info("start to acquire data")
+        self.sink.bind(self.stats)
+        inflight = threading.Semaphore(2 * self.processes)
+        with multiprocessing.Pool(self.processes, initializer=_init_worker,
+                                  initargs=(self.process, self.side_effect is not None)) as pool:
+            imap = pool.imap if self.ordered else pool.imap_unordered
+            for results, stats in imap(_process_chunk, self._chunks(inflight)):
+                inflight.release()
+                self.stats += stats
+                for row, x, msg in results:
+                    try:
+                        self._write_row(row, x, msg, self.stats)
+                    except Exception as e:
+                        self.stats.count("error")
+                        logger.error(f"Cannot process record : {e}")
+        self.sink.flush()
+        return self
+
+
 class NgsiAgentServer(NgsiAgent):
 
     """
@@ -188,6 +446,12 @@ class NgsiAgentServer(NgsiAgent):
 
         def __init__(self):
             self.starttime = datetime.now()
+            self._lock = threading.Lock()
+
+        def count(self, name: str, n: int = 1):
+            """Increment a counter from a thread of the server"""
+            with self._lock:
+                setattr(self, name, getattr(self, name) + n)
 
     def __init__(self,
                  server: pyngsi.sources.server.Server = None,
@@ -205,9 +469,28 @@ class NgsiAgentServer(NgsiAgent):
         logger.info(f"side_effect = [{self.side_effect}]")
         self.server_status = self.ServerStatus()
         self.stats = NgsiAgent.Stats()
+        self.sink.bind(self.stats)  # the sink is shared by all the requests
+
+    def process_source(self, src: Source, stats: NgsiAgent.Stats = None) -> NgsiAgent.Stats:
+        """
+        Process the content of a request through the shared sink.
+
+        Thread-safe : the server calls it from concurrent threads.
+        Returns the statistics of the request, that are merged to the statistics of the agent.
+        """
+        stats = stats if stats is not None else NgsiAgent.Stats()
+        try:
+            self.feed(src, stats)
+            self.sink.flush()
+        finally:
+            self.stats += stats
+        return stats
 
     @property
     def status(self):
+        """Returns the server status and the statistics, and the counters of the server if any (i.e. ServerUdp)"""
+        if server_counters := self.server.status():
+            return self.server_status, self.stats, server_counters
         return self.server_status, self.stats
 
     def run(self):
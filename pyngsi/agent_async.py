@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import inspect
+
+from loguru import logger
+from typing import Callable, Union
+from collections.abc import AsyncIterable
+
+from pyngsi.sources.source import Row, Source
+from pyngsi.sources.source_async import AsyncSourceAdapter
+from pyngsi.sink import Sink
+from pyngsi.sink_async import AsyncSink, AsyncSinkAdapter
+from pyngsi.ngsi import BaseDataModel
+from pyngsi.agent import NgsiAgent
+
+
+class NgsiAgentAsync(NgsiAgent):
+
+    """
+    The NgsiAgentAsync is the asyncio counterpart of the NgsiAgentPull.
+
+    Rows are pulled from an async iterable and processed concurrently, up to a given number of rows in flight.
+    The process and side_effect functions may be either plain functions or coroutine functions.
+    Synchronous Sources and Sinks are accepted : they are wrapped in adapters.
+
+    async def main():
+        agent = NgsiAgentAsync(src, AsyncSinkOrion(), process=build_entity)
+        await agent.run()
+        await agent.close()
+
+    asyncio.run(main())
+    """
+
+    def __init__(self,
+                 source: Union[AsyncIterable, Source],
+                 sink: Union[AsyncSink, Sink],
+                 process: Callable = lambda row, *args, **kwargs: row.record,
+                 side_effect: Callable = None,
+                 concurrency: int = 100):
+        logger.info("init NGSI async agent")
+        self.source = source if isinstance(
+            source, AsyncIterable) else AsyncSourceAdapter(source)
+        logger.info(f"source = [{self.source.__class__.__name__}]")
+        self.sink = sink if isinstance(
+            sink, AsyncSink) else AsyncSinkAdapter(sink)
+        logger.info(f"sink = [{self.sink.__class__.__name__}]")
+        self.process = process
+        self.side_effect = side_effect
+        self.concurrency = concurrency
+        logger.info(f"{concurrency=}")
+        self.stats = NgsiAgent.Stats()
+
+    @property
+    def status(self):
+        return self.stats
+
+    async def _process_row(self, row: Row):
+        logger.debug(row)
+        try:
+            if row.provider is None:
+                row.provider = "user"
+            logger.trace(f"{row.provider=}\t{row.record=}")
+            self.stats.input += 1
+            x = self.process(row)
+            if inspect.isawaitable(x):
+                x = await x
+            if not x:
+                self.stats.filtered += 1
+                return
+            self.stats.processed += 1
+            msg = x.json() if isinstance(x, BaseDataModel) else x
+            await self.sink.write(msg)
+            self.stats.output += 1
+            if self.side_effect:
+                if inspect.iscoroutinefunction(self.side_effect):
+                    side_entities = await self.side_effect(row, self.sink, x)
+                else:  # a sync side effect writes to the sync sink
+                    sink = self.sink.sink if isinstance(
+                        self.sink, AsyncSinkAdapter) else self.sink
+                    side_entities = self.side_effect(row, sink, x)
+                self.stats.side_entities += side_entities
+        except Exception as e:
+            self.stats.error += 1
+            logger.error(f"Cannot process record : {e}")
+
+    async def run(self):
+        logger.info("start to acquire data")
+        self.sink.bind(self.stats)
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+        async for row in self.source:
+            await slots.acquire()
+            task = asyncio.create_task(self._process_row(row))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+            task.add_done_callback(lambda _: slots.release())
+        if tasks:
+            await asyncio.gather(*tasks)
+        await self.sink.flush()
+        return self
+
+    async def close(self):
+        logger.info("close NGSI async agent")
+        logger.info(self.status)
+        if close := getattr(self.source, "close", None):
+            close()
+        logger.info(f"close sink")
+        await self.sink.close()
+
+    def reset(self):
+        if reset := getattr(self.source, "reset", None):
+            reset()
+        self.stats.zero()
@@ -4,11 +4,14 @@
 import json
 import urllib.parse
 
+from abc import ABC, abstractmethod
 from datetime import datetime, timedelta
 from geojson import Point
 from typing import Any
 from collections.abc import Sequence, Callable
 
+from pyngsi.utils import jsonbackend
+
 ONE_WEEK = 7*86400
 
 # https://fiware-orion.readthedocs.io/en/master/user/forbidden_characters/index.html
@@ -36,17 +39,17 @@ def unescape(value: str) -> str:
     return urllib.parse.unquote(value)
 
 
-class DataModel(dict):
+class BaseDataModel(ABC):
+    """
+    Builds a NGSI entity. Base class of the entity representations : DataModel and CompactDataModel.
 
-    transient_timeout = None
+    Subclasses store attributes through _set() and return them as NGSI v2 dict through to_dict().
+    """
 
-    def __init__(self, id: str, type: str, strict: bool = False, serializer: Callable = str):
-        self.strict = strict
-        self.serializer = serializer
-        self["id"] = id
-        self["type"] = type
-        if self.transient_timeout:
-            self.add_transient(self.transient_timeout)
+    __slots__ = ()
+
+    transient_timeout = None
+    dumps = staticmethod(jsonbackend.dumps_json)
 
     @classmethod
     def set_transient(cls, timeout: int = ONE_WEEK):
@@ -56,6 +59,14 @@ class DataModel(dict):
     def unset_transient(cls):
         cls.transient_timeout = None
 
+    @classmethod
+    def set_json_backend(cls, name: str = "json"):
+        """Select the JSON serialization backend : json (default), orjson or auto"""
+        try:
+            cls.dumps = staticmethod(jsonbackend.get_backend(name))
+        except ValueError as e:
+            raise NgsiError(e)
+
     @staticmethod
     def enforce_general_restrictions(name: str, value: str):
         if 1 in [c in value for c in FORBIDDEN_CHARACTERS]:
@@ -78,6 +89,14 @@ class DataModel(dict):
             raise NgsiRestrictionViolationError(
                 f"{name} uses a reserved keyword")
 
+    @abstractmethod
+    def _set(self, name: str, value: Any, t: str, metadata: dict = None):
+        pass
+
+    @abstractmethod
+    def to_dict(self) -> dict:
+        pass
+
     def add(self, name: str, value: Any,
             isdate: bool = False, isurl: bool = False, urlencode=False, metadata: dict = {}):
         if self.strict:
@@ -118,9 +137,7 @@ class DataModel(dict):
         else:
             raise NgsiError(
                 f"Cannot map {type(value)} to NGSI type. {name=} {value=}")
-        self[name] = {"value": v, "type": t}
-        if metadata:
-            self[name]["metadata"] = metadata
+        self._set(name, v, t, metadata)
 
     def add_date(self, *args, **kwargs):
         self.add(isdate=True, *args, **kwargs)
@@ -146,11 +163,11 @@ class DataModel(dict):
             raise NgsiError(
                 f"Bad relationship name : {rel_name}. Relationship attributes must use prefix 'ref'")
         t, v = "Relationship", f"{fq_ref_type}:{ref_id}"
-        self[rel_name] = {"value": v, "type": t}
+        self._set(rel_name, v, t)
 
     def add_address(self, value: dict):
         t, v = "PostalAddress", value
-        self["address"] = {"value": v, "type": t}
+        self._set("address", v, t)
 
     def add_transient(self, timeout: int = ONE_WEEK, expire: datetime = None):
         if not expire:
@@ -159,8 +176,93 @@ class DataModel(dict):
 
     def json(self):
         """Returns the datamodel in json format"""
-        return json.dumps(self, default=self.serializer, ensure_ascii=False)
+        return self.dumps(self.to_dict(), self.serializer)
 
     def pprint(self):
         """Returns the datamodel pretty-json-formatted"""
-        print(json.dumps(self, default=self.serializer, indent=2))
+        print(json.dumps(self.to_dict(), default=self.serializer, indent=2))
+
+
+class DataModel(BaseDataModel, dict):
+
+    def __init__(self, id: str, type: str, strict: bool = False, serializer: Callable = str):
+        self.strict = strict
+        self.serializer = serializer
+        self["id"] = id
+        self["type"] = type
+        if self.transient_timeout:
+            self.add_transient(self.transient_timeout)
+
+    def _set(self, name: str, value: Any, t: str, metadata: dict = None):
+        self[name] = {"value": value, "type": t}
+        if metadata:
+            self[name]["metadata"] = metadata
+
+    def to_dict(self) -> dict:
+        return self
+
+
+class CompactDataModel(BaseDataModel):
+    """
+    A CompactDataModel is a memory-efficient alternative to the DataModel.
+
+    It offers the same methods to build the entity and serializes to the same NGSI v2 JSON.
+    No dict is allocated per attribute : attributes are stored as (value, type, metadata) tuples.
+    Use it when many entities are kept in memory, i.e. when buffering entities.
+
+    The NGSI v2 dict representation is built on demand : m["temperature"] returns a new dict.
+    """
+
+    __slots__ = ("id", "type", "strict", "serializer", "_attrs")
+
+    def __init__(self, id: str, type: str, strict: bool = False, serializer: Callable = str):
+        self.id = id
+        self.type = type
+        self.strict = strict
+        self.serializer = serializer
+        self._attrs = {}
+        if self.transient_timeout:
+            self.add_transient(self.transient_timeout)
+
+    def _set(self, name: str, value: Any, t: str, metadata: dict = None):
+        self._attrs[name] = (value, t, metadata) if metadata else (value, t)
+
+    @staticmethod
+    def _attr(attr: tuple) -> dict:
+        d = {"value": attr[0], "type": attr[1]}
+        if len(attr) == 3:
+            d["metadata"] = attr[2]
+        return d
+
+    def __getitem__(self, name: str):
+        if name == "id":
+            return self.id
+        if name == "type":
+            return self.type
+        return self._attr(self._attrs[name])
+
+    def __contains__(self, name: str):
+        return name in ("id", "type") or name in self._attrs
+
+    def __iter__(self):
+        yield "id"
+        yield "type"
+        yield from self._attrs
+
+    def __len__(self):
+        return len(self._attrs) + 2
+
+    def __eq__(self, o):
+        return isinstance(o, (CompactDataModel, DataModel)) and self.to_dict() == o.to_dict()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.to_dict()})"
+
+    def keys(self):
+        return list(self)
+
+    def to_dict(self) -> dict:
+        d = {"id": self.id, "type": self.type}
+        for name, attr in self._attrs.items():
+            d[name] = self._attr(attr)
+        return d
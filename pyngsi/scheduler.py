@@ -8,7 +8,7 @@ import time
 import schedule
 import _thread
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from cheroot.wsgi import Server as WSGIServer
 from loguru import logger
 from datetime import datetime
@@ -18,6 +18,7 @@ from enum import Enum, auto
 
 from pyngsi.sink import Sink
 from pyngsi.agent import NgsiAgent, NgsiAgentPull
+from pyngsi.utils.metrics import Metrics, CachedStatus, CONTENT_TYPE
 from pyngsi.__init__ import __version__
 
 
@@ -60,7 +61,8 @@ class Scheduler():
                  wsgi_port: int = 8880,
                  debug: bool = False,
                  interval: int = 1,
-                 unit: UNIT = UNIT.minutes):
+                 unit: UNIT = UNIT.minutes,
+                 status_interval: float = 30.0):
 
         self.agent = agent
         self.host = host
@@ -70,12 +72,16 @@ class Scheduler():
         self.interval = interval
         self.unit = unit
         self.status = SchedulerStatus()
+        # the remote status is refreshed in the background
+        self.remote_status = CachedStatus(agent.sink.status, status_interval)
 
         self.app = Flask(__name__)
         self.app.add_url_rule("/version", 'version',
                               self._version, methods=['GET'])
         self.app.add_url_rule("/status", 'status',
                               self._status, methods=['GET'])
+        self.app.add_url_rule("/metrics", 'metrics',
+                              self._metrics, methods=['GET'])
 
     def _flaskthread(self):
         if self.debug:
@@ -140,9 +146,20 @@ class Scheduler():
 
     def _status(self):
         logger.trace("ask for status")
-        remote_status = self.agent.sink.status()
+        status = {"poll_status": self.status}
+        if self.agent.latency:
+            status["latency"] = self.agent.latency.to_dict()
+        remote_status = self.remote_status.get()
         if remote_status:
-            return jsonify(poll_status=self.status,
-                           orion_status=remote_status)
-        else:
-            return jsonify(poll_status=self.status)
+            status["orion_status"] = remote_status
+        return jsonify(**status)
+
+    def _metrics(self):
+        logger.trace("ask for metrics")
+        metrics = Metrics()
+        metrics.add_calls(self.status)
+        metrics.add_stats(self.status.stats)
+        metrics.add_latency(self.agent.latency)
+        metrics.add_queues(getattr(self.agent, "queues", None))
+        metrics.add_remote_status(self.remote_status.get())
+        return Response(metrics.text(), content_type=CONTENT_TYPE)
@@ -6,6 +6,8 @@ Sinks.
 Sinks MUST respect the following protocol :
 Each Sink Class MUST implement write().
 Some Sinks MAY override close() if needed to free resources.
+Some Sinks MAY defer writes (i.e. buffering). They MUST override flush() to deliver pending records,
+and report records they fail to deliver later to the statistics of the agent bound to them.
 
 SinkOrion is the one you will want to use in your project.
 Other sinks such as SinkStdout or SinkFile are useful during the development stage and for unit testing.
@@ -13,15 +15,29 @@ Other sinks such as SinkStdout or SinkFile are useful during the development sta
 
 
 import gzip
+import hashlib
+import json
 import requests
 import os
+import queue
+import random
+import socket
+import struct
+import threading
+import time
+import zlib
 
 from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass
 from loguru import logger
+from typing import Any, Callable, Hashable, Tuple
 from requests_toolbelt.utils import dump
+from urllib3.connection import HTTPConnection
 
 from pyngsi.__init__ import __version__ as version
 from pyngsi.utils import eyaml
+from pyngsi.utils.jsonbackend import dumps_json
 
 
 class Sink(ABC):
@@ -32,10 +48,22 @@ class Sink(ABC):
     One can code its own Sink just by extending Sink.
     """
 
+    stats = None  # statistics of the agent currently writing to the sink
+
     @abstractmethod
     def write(self, msg):
         pass
 
+    def bind(self, stats):
+        """Attach the statistics of the agent writing to the sink
+
+        Sinks that defer writes account here the records they eventually fail to deliver.
+        """
+        self.stats = stats
+
+    def flush(self):
+        pass
+
     def status(self):
         pass
 
@@ -47,6 +75,116 @@ class SinkException(Exception):
     pass
 
 
+class SinkCircuitOpenException(SinkException):
+    pass
+
+
+@dataclass
+class RetryPolicy:
+    """When and how long to wait before retrying a failed HTTP request
+
+    Connection errors, timeouts and responses with a retryable status code are retried.
+    The delay doubles at each attempt, up to max_backoff. Jitter randomly shortens it by up to the given ratio.
+    """
+    max_attempts: int = 3
+    backoff: float = 0.5
+    max_backoff: float = 10.0
+    jitter: float = 0.5
+    retry_on: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def delay(self, attempt: int) -> float:
+        """Returns the delay in seconds before the next attempt, given the number of failed attempts"""
+        delay = min(self.backoff * 2 ** (attempt-1), self.max_backoff)
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+    """Stop sending requests to a server that keeps failing
+
+    The breaker opens after failure_threshold consecutive failures : requests fail fast.
+    After reset_timeout seconds it turns half-open and lets a single probe request through.
+    A successful probe closes the breaker, a failed probe opens it again.
+    To keep entities while the breaker is open rather than failing them, wrap the sink in a SinkSpool.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None  # when the breaker opened, monotonic
+        self._probe_at = None  # when the breaker can turn half-open, monotonic
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Returns True if a request can be sent"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() >= self._probe_at:
+                logger.info("circuit breaker half-open : probe server")
+                self.state = self.HALF_OPEN
+                return True
+            return False
+
+    def success(self) -> float:
+        """Records a successful request. Returns the time spent open if the breaker closes."""
+        with self._lock:
+            self.failures = 0
+            if self.state == self.CLOSED:
+                return 0.0
+            logger.info("circuit breaker closed")
+            open_time = time.monotonic() - self.opened_at
+            self.state, self.opened_at = self.CLOSED, None
+            return open_time
+
+    def failure(self) -> bool:
+        """Records a failed request. Returns True if the breaker trips."""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN:
+                logger.warning("circuit breaker probe failed")
+                self.state = self.OPEN
+                self._probe_at = time.monotonic() + self.reset_timeout
+            elif self.state == self.CLOSED and self.failures >= self.failure_threshold:
+                logger.warning(
+                    f"circuit breaker open after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_at = self.opened_at + self.reset_timeout
+                return True
+            return False
+
+
+class SinkWrapper(Sink):
+    """
+    A SinkWrapper adds a behaviour to the Sink it wraps
+
+    By default all calls are delegated to the wrapped sink.
+    """
+
+    def __init__(self, sink: Sink):
+        self.sink = sink
+
+    def write(self, msg):
+        self.sink.write(msg)
+
+    def bind(self, stats):
+        super().bind(stats)
+        self.sink.bind(stats)
+
+    def flush(self):
+        self.sink.flush()
+
+    def status(self):
+        return self.sink.status()
+
+    def close(self):
+        self.sink.close()
+
+
 class SinkNull(Sink):
     """Do not write anything. For debugging purpose only."""
 
@@ -110,6 +248,30 @@ class SinkFileGzipped(SinkFile):
             raise SinkException(f"cannot open file {self.filename} : {e}")
 
 
+_COMPRESSORS = {
+    None: None,
+    "gzip": lambda data, level: gzip.compress(data, compresslevel=level),
+    "deflate": lambda data, level: zlib.compress(data, level)
+}
+
+
+class _HTTPAdapter(requests.adapters.HTTPAdapter):
+    """A HTTPAdapter that enables TCP keep-alive on its connections"""
+
+    def __init__(self, tcp_keepalive: int = None, **kwargs):
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.tcp_keepalive:
+            options = [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            if hasattr(socket, "TCP_KEEPIDLE"):  # not on macOS and Windows
+                options += [(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.tcp_keepalive),
+                            (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, self.tcp_keepalive)]
+            kwargs["socket_options"] = HTTPConnection.default_socket_options + options
+        super().init_poolmanager(*args, **kwargs)
+
+
 class SinkHttp(Sink):
     """Send to HTTP server
 
@@ -127,12 +289,16 @@ class SinkHttp(Sink):
         endpoint to ask server for its status and its processing statistics        
     proxy: str
         HTTP Proxy string (i.e http://127.0.0.1:8080)
+    retry: RetryPolicy
+        retry policy of failed requests
+    breaker: CircuitBreaker
+        circuit breaker that fails fast while the server is down
     """
 
     def __init__(self, hostname="127.0.0.1", port=8080, secure=False, baseurl="/",
                  post_endpoint="/", post_query="", status_endpoint="/status",
                  useragent=f"NgsiAgent v{version}",
-                 proxy=None):
+                 proxy=None, retry: RetryPolicy = None, breaker: CircuitBreaker = None):
         """
         Parameters
         ----------
@@ -146,6 +312,10 @@ class SinkHttp(Sink):
             HTTP User-Agent header sent in the request
         proxy: str
             HTTP Proxy string (i.e http://127.0.0.1:8080)
+        retry: RetryPolicy
+            Retry policy of failed requests. Defaults to no retry.
+        breaker: CircuitBreaker
+            Circuit breaker. Defaults to no breaker.
         """
         logger.debug("init SinkHttp")
         if (baseurl[0] != "/"):
@@ -157,18 +327,80 @@ class SinkHttp(Sink):
         self.baseurl = baseurl = baseurl.rstrip("/")
         self.post_endpoint = post_endpoint = post_endpoint.rstrip("/")
         self.status_endpoint = status_endpoint = status_endpoint.rstrip("/")
-        prefix = f"{self.protocol}://{hostname}:{port}{baseurl}"
+        self.prefix = prefix = f"{self.protocol}://{hostname}:{port}{baseurl}"
         self.post_url = f"{prefix}{post_endpoint}?{post_query}" if post_query else f"{prefix}{post_endpoint}"
         self.status_url = f"{prefix}{status_endpoint}"
         self.proxy = proxy
+        self.proxies = {"http": proxy, "https": proxy} if proxy else None
         self.headers = {'Content-Type': 'application/json',
                         'User-Agent': useragent}
         self.session = requests.Session()
+        self.retry = retry
+        self.breaker = breaker
+        self.compression = None
+        self.compression_threshold = 1024
+        self.compression_level = 6
+        self.bytes_raw = 0  # request bodies sent, before compression
+        self.bytes_sent = 0  # request bodies sent, after compression
+        self._bytes_lock = threading.Lock()
         logger.info(f"{self.baseurl=}")
         logger.info(f"{self.post_url=}")
         logger.info(f"{self.status_url=}")
         logger.info(f"{useragent=}")
         logger.info(f"{self.proxy=}")
+        logger.info(f"{retry=}")
+        if breaker:
+            logger.info(
+                f"{breaker.failure_threshold=} {breaker.reset_timeout=}")
+
+    def set_pool(self, pool_connections: int = 1, pool_maxsize: int = 10, pool_block: bool = False,
+                 keep_alive: bool = True, tcp_keepalive: int = None):
+        """Sizes the HTTP connection pool of the session and sets keep-alive
+
+        Parameters
+        ----------
+        pool_connections: int
+            Number of hosts to keep a pool for
+        pool_maxsize: int
+            Max number of connections kept alive per host
+        pool_block: bool
+            Wait for a free connection rather than opening one that will not be kept
+        keep_alive: bool
+            Reuse connections between requests. False sends Connection: close.
+        tcp_keepalive: int
+            Idle time in seconds before TCP keep-alive probes are sent. None to keep the system settings.
+            Prevents NAT and firewalls from dropping idle connections.
+        """
+        logger.info(
+            f"{pool_connections=} {pool_maxsize=} {pool_block=} {keep_alive=} {tcp_keepalive=}")
+        adapter = _HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                               pool_block=pool_block, tcp_keepalive=tcp_keepalive)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if keep_alive:
+            self.headers.pop("Connection", None)
+        else:
+            self.headers["Connection"] = "close"
+
+    def set_compression(self, compression: str = "gzip", threshold: int = 1024, level: int = 6):
+        """Compresses request bodies. The server, or a reverse proxy in front of it, must accept Content-Encoding.
+
+        Parameters
+        ----------
+        compression: str
+            gzip, deflate, or None to disable compression
+        threshold: int
+            Bodies smaller than threshold bytes are sent uncompressed
+        level: int
+            Compression level, from 1 (fastest) to 9 (smallest)
+        """
+        if compression not in _COMPRESSORS:
+            raise SinkException(
+                f"Unknown compression {compression}. Available compressions : {list(_COMPRESSORS)}")
+        logger.info(f"{compression=} {threshold=} {level=}")
+        self.compression = compression
+        self.compression_threshold = threshold
+        self.compression_level = level
 
     def write(self, msg):
         """Sends HTTP POST request with the NGSI data
@@ -180,18 +412,81 @@ class SinkHttp(Sink):
         """
 
         try:
-            r = self.session.post(
-                self.post_url, msg, headers=self.headers,
-                proxies={self.proxy} if self.proxy else None)
-            logger.trace(dump.dump_all(r).decode('utf-8'))
-            r.raise_for_status()
+            self._post(self.post_url, msg)
         except requests.exceptions.HTTPError as e:
             raise SinkException(
-                f"cannot write to SinkHttp : {e}\nServer returned : {r.text}\nrecord={msg}")
+                f"cannot write to SinkHttp : {e}\nServer returned : {e.response.text}\nrecord={msg}")
+        except SinkCircuitOpenException as e:
+            raise SinkCircuitOpenException(
+                f"cannot write to SinkHttp : {e}\nrecord={msg}")
         except Exception as e:
             raise SinkException(
                 f"cannot write to SinkHttp : {e}\nrecord={msg}")
 
+    def _count(self, name: str, n: float = 1):
+        if self.stats:
+            self.stats.count(name, n)
+
+    def _post(self, url: str, data) -> requests.Response:
+        """Sends a HTTP POST request, applying the retry policy and the circuit breaker
+
+        Raises
+        ------
+        SinkCircuitOpenException
+            The circuit breaker is open
+        requests.exceptions.RequestException
+            The request failed, the HTTPError holds the server response
+        """
+        if self.breaker and not self.breaker.allow():
+            raise SinkCircuitOpenException("circuit breaker open")
+        body = data.encode("utf-8") if isinstance(data, str) else data
+        headers = self.headers
+        raw_size = len(body)
+        if self.compression and raw_size >= self.compression_threshold:
+            body = _COMPRESSORS[self.compression](body, self.compression_level)
+            headers = {**headers, "Content-Encoding": self.compression}
+        attempt = 0
+        while True:
+            attempt += 1
+            with self._bytes_lock:
+                self.bytes_raw += raw_size
+                self.bytes_sent += len(body)
+            try:
+                r = self.session.post(
+                    url, body, headers=headers, proxies=self.proxies)
+                logger.opt(lazy=True).trace(
+                    "{}", lambda: dump.dump_all(r).decode("utf-8", errors="replace"))
+                r.raise_for_status()
+                break
+            except requests.exceptions.RequestException as e:
+                if isinstance(e, requests.exceptions.HTTPError):
+                    # the server is up : only server errors count as breaker failures
+                    retryable = e.response.status_code in self.retry.retry_on if self.retry else False
+                    failure = retryable or e.response.status_code >= 500
+                else:
+                    retryable = failure = True
+                if retryable and self.retry and attempt < self.retry.max_attempts \
+                        and (not self.breaker or self.breaker.state == CircuitBreaker.CLOSED):
+                    delay = self.retry.delay(attempt)
+                    logger.warning(f"Request failed, retry in {delay:.2f}s : {e}")
+                    self._count("retries")
+                    time.sleep(delay)
+                    continue
+                if self.breaker:
+                    if failure:
+                        if self.breaker.failure():
+                            self._count("breaker_trips")
+                    elif open_time := self.breaker.success():
+                        self._count("breaker_open_time", open_time)
+                raise
+        if self.breaker and (open_time := self.breaker.success()):
+            self._count("breaker_open_time", open_time)
+        return r
+
+    def close(self):
+        logger.info(f"{self.bytes_raw=} {self.bytes_sent=}")
+        self.session.close()
+
     def status(self) -> dict:
         logger.debug("ask http server status")
         try:
@@ -225,12 +520,13 @@ class SinkOrion(SinkHttp):
                  post_endpoint="/v2/entities", post_query="options=upsert", status_endpoint="/version",
                  useragent=f"NgsiAgent v{version}", proxy=None,
                  token=None, user=None, passwd=None,
-                 service=None, servicepath=None
+                 service=None, servicepath=None,
+                 retry: RetryPolicy = None, breaker: CircuitBreaker = None
                  ):
         logger.debug("init SinkOrion")
         super().__init__(hostname, port, secure, baseurl,
                          post_endpoint, post_query, status_endpoint,
-                         useragent, proxy)
+                         useragent, proxy, retry, breaker)
         self.user, self.passwd = user, passwd
         if 'X-Auth-Token' in self.headers:
             logger.info(
@@ -304,3 +600,698 @@ class SinkOrion(SinkHttp):
     def from_dict(cls, config: dict):
         kwargs = SinkOrion._load_config_from_dict(config)
         return cls(**kwargs)
+
+
+class SinkOrionBatch(SinkOrion):
+    """Send to Orion Context Broker by batches
+
+    Entities are buffered then sent at once through the NGSI v2 batch update operation.
+    The buffer is flushed when it holds batch_size entities, when its payload would exceed max_bytes,
+    when the oldest buffered entity has been waiting for max_latency seconds, and when the sink is closed.
+
+    Orion rejects a batch as a whole. When a batch is refused (4xx), its entities are sent one by one
+    so that each faulty entity is reported to the agent statistics.
+    """
+
+    def __init__(self, *args,
+                 batch_endpoint="/v2/op/update", action_type="append",
+                 batch_size: int = 100, max_bytes: int = 1000000, max_latency: float = 1.0,
+                 **kwargs):
+        """
+        Parameters
+        ----------
+        batch_endpoint: str
+            Orion batch update endpoint
+        action_type: str
+            NGSI v2 batch action, append acts as an upsert
+        batch_size : int
+            Max number of entities per batch
+        max_bytes : int
+            Max size of a batch payload in bytes. Orion default limit is 1MB.
+        max_latency: float
+            Max time in seconds an entity stays in the buffer. None to disable the timer.
+        """
+        logger.debug("init SinkOrionBatch")
+        super().__init__(*args, **kwargs)
+        self.batch_url = f"{self.prefix}{batch_endpoint.rstrip('/')}"
+        self.action_type = action_type
+        self.batch_size = batch_size
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+        self._header = f'{{"actionType": "{action_type}", "entities": ['.encode(
+            "utf-8")
+        self._buffer = []
+        self._nbytes = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        logger.info(f"{self.batch_url=}")
+        logger.info(f"{batch_size=} {max_bytes=} {max_latency=}")
+
+    def write(self, msg):
+        """Buffers the NGSI entity. May send the pending batch.
+
+        Parameters
+        ----------
+        msg: str
+            the NGSI data
+        """
+        data = (msg if isinstance(msg, str) else json.dumps(
+            msg, ensure_ascii=False)).encode("utf-8")
+        with self._lock:
+            # len(header) + len("]}") + separators
+            if self._buffer and len(self._header) + self._nbytes + len(self._buffer) + len(data) + 2 > self.max_bytes:
+                self.flush()
+            self._buffer.append(data)
+            self._nbytes += len(data)
+            if len(self._buffer) >= self.batch_size:
+                self.flush()
+            elif self._timer is None and self.max_latency:
+                self._timer = threading.Timer(
+                    self.max_latency, self._on_timeout)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Sends the pending batch"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            batch, self._buffer, self._nbytes = self._buffer, [], 0
+            if batch:
+                self._send(batch)
+
+    def close(self):
+        self.flush()
+        super().close()
+
+    def _on_timeout(self):
+        logger.trace("batch timeout")
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Cannot flush batch : {e}")
+
+    def _send(self, batch):
+        logger.debug(f"send batch of {len(batch)} entities")
+        payload = self._header + b",".join(batch) + b"]}"
+        try:
+            self._post(self.batch_url, payload)
+        except requests.exceptions.HTTPError as e:
+            r = e.response
+            if r.status_code < 500:
+                logger.warning(
+                    f"Batch rejected : {e}\nServer returned : {r.text}\nSend entities one by one")
+                for data in batch:
+                    try:
+                        super().write(data)
+                    except SinkException as e:
+                        self._reject(e)
+            else:
+                self._reject(SinkException(
+                    f"cannot write to SinkOrionBatch : {e}\nServer returned : {r.text}"), len(batch))
+        except Exception as e:
+            self._reject(SinkException(
+                f"cannot write to SinkOrionBatch : {e}"), len(batch))
+
+    def _reject(self, e: Exception, n: int = 1):
+        logger.error(f"Cannot write {n} record(s) : {e}")
+        if self.stats:
+            self.stats.reject(n)
+
+
+def entity_key(msg: Any) -> Hashable:
+    """Returns the (id, type) of a NGSI entity given as a JSON string or a dict"""
+    try:
+        entity = msg if isinstance(msg, dict) else json.loads(msg)
+        key = entity["id"], entity.get("type")
+        hash(key)
+        return key
+    except Exception:  # not an entity : the message itself, as a hashable key
+        return msg if isinstance(msg, Hashable) else str(msg)
+
+
+class SinkConcurrent(SinkWrapper):
+    """Write to the wrapped sink from a pool of workers
+
+    Up to workers requests are in flight at the same time.
+    Each worker has its own bounded queue : write() blocks when the queue is full.
+    Messages are dispatched to workers according to their key, the entity (id, type) by default.
+    Hence updates of the same entity are written one after the other, in order.
+    """
+
+    _STOP = object()
+
+    def __init__(self, sink: Sink, workers: int = 8, queue_size: int = 100,
+                 key: Callable[[Any], Hashable] = entity_key, pool_maxsize: int = None):
+        """
+        Parameters
+        ----------
+        sink : Sink
+            The wrapped sink, typically a SinkHttp or a SinkOrion
+        workers : int
+            Number of requests in flight
+        queue_size : int
+            Max number of pending messages per worker
+        key : Callable
+            Function that returns the ordering key of a message
+        pool_maxsize : int
+            Number of HTTP connections kept alive. Defaults to the number of workers.
+        """
+        logger.debug("init SinkConcurrent")
+        super().__init__(sink)
+        self.workers = workers
+        self.key = key
+        if isinstance(sink, SinkHttp):
+            sink.set_pool(pool_maxsize=pool_maxsize or workers)
+        self._queues = [queue.Queue(queue_size) for _ in range(workers)]
+        self._threads = [threading.Thread(target=self._work, args=(q,), daemon=True)
+                         for q in self._queues]
+        for t in self._threads:
+            t.start()
+        logger.info(f"{workers=} {queue_size=}")
+
+    def write(self, msg):
+        """Queues the message for a worker. Blocks while the worker queue is full.
+
+        Parameters
+        ----------
+        msg: str
+            the NGSI data
+        """
+        self._queues[hash(self.key(msg)) % self.workers].put(msg)
+
+    def flush(self):
+        """Waits for all pending messages to be written"""
+        for q in self._queues:
+            q.join()
+        self.sink.flush()
+
+    def close(self):
+        self.flush()
+        for q in self._queues:
+            q.put(self._STOP)
+        for t in self._threads:
+            t.join()
+        self.sink.close()
+
+    def _work(self, q: queue.Queue):
+        while True:
+            msg = q.get()
+            try:
+                if msg is self._STOP:
+                    break
+                self.sink.write(msg)
+            except Exception as e:
+                logger.error(f"Cannot write record : {e}")
+                if self.stats:
+                    self.stats.reject()
+            finally:
+                q.task_done()
+
+
+class SinkCoalesce(SinkWrapper):
+    """Coalesce writes of a same entity before writing them to the wrapped sink
+
+    Within a window, only the latest write of an entity is kept.
+    When merge is True, the attributes written to the entity are merged instead : the latest value of each attribute wins.
+    The window ends when max_latency seconds have elapsed since its first write, when it holds max_entities entities,
+    on flush() and when the sink is closed. Coalesced entities are then written, in order of their first write.
+
+    Use it in front of a SinkOrion when sources update entities much faster than needed, i.e. MQTT sensors.
+    """
+
+    def __init__(self, sink: Sink, max_latency: float = 5.0, max_entities: int = 1000, merge: bool = False,
+                 key: Callable[[Any], Hashable] = entity_key):
+        """
+        Parameters
+        ----------
+        sink : Sink
+            The wrapped sink, typically a SinkOrion
+        max_latency: float
+            Duration of the window in seconds. None to disable the timer.
+        max_entities : int
+            Max number of entities in the window
+        merge : bool
+            Merge the attributes of the entity rather than keeping the latest write
+        key : Callable
+            Function that returns the entity key of a message, the entity (id, type) by default
+        """
+        logger.debug("init SinkCoalesce")
+        super().__init__(sink)
+        self.max_latency = max_latency
+        self.max_entities = max_entities
+        self.merge = merge
+        self.key = key
+        self.received = 0  # messages written to the sink
+        self.written = 0  # messages written to the wrapped sink
+        self._pending = {}  # key -> (message, number of coalesced writes)
+        self._timer = None
+        self._lock = threading.RLock()
+        logger.info(f"{max_latency=} {max_entities=} {merge=}")
+
+    def write(self, msg):
+        """Coalesces the message with the pending writes of the same entity. May flush the window.
+
+        Parameters
+        ----------
+        msg: str
+            the NGSI data
+        """
+        if self.merge:
+            try:
+                msg = msg if isinstance(msg, dict) else json.loads(msg)
+            except Exception as e:
+                raise SinkException(f"cannot coalesce record : {e}\nrecord={msg}")
+        k = self.key(msg)
+        with self._lock:
+            self.received += 1
+            if k in self._pending:
+                pending, n = self._pending[k]
+                if self.merge:
+                    pending.update(msg)
+                    msg = pending
+                self._pending[k] = (msg, n + 1)
+                return
+            self._pending[k] = (dict(msg) if self.merge else msg, 1)
+            if len(self._pending) >= self.max_entities:
+                self.flush()
+            elif self._timer is None and self.max_latency:
+                self._timer = threading.Timer(
+                    self.max_latency, self._on_timeout)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Writes the coalesced entities"""
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._pending = self._pending, {}
+            logger.debug(f"write {len(pending)} coalesced entities")
+            for msg, n in pending.values():
+                try:
+                    self.sink.write(dumps_json(msg) if self.merge else msg)
+                    self.written += 1
+                except Exception as e:
+                    # the n coalesced writes are lost
+                    logger.error(f"Cannot write {n} record(s) : {e}")
+                    if self.stats:
+                        self.stats.reject(n)
+        self.sink.flush()
+
+    def close(self):
+        self.flush()
+        logger.info(f"{self.received=} {self.written=}")
+        self.sink.close()
+
+    def _on_timeout(self):
+        logger.trace("coalesce timeout")
+        try:
+            self.flush()
+        except Exception as e:
+            logger.error(f"Cannot flush coalesced entities : {e}")
+
+
+class SinkSkipUnchanged(SinkWrapper):
+    """Skip writes of entities unchanged since their last write
+
+    A digest of the attributes of each entity written is kept in a cache, keyed by the entity (id, type).
+    A write whose attributes have the same digest as the cached one is skipped.
+    Useful when a Scheduler polls an API that returns mostly the same entities at each run.
+
+    The cache holds up to max_entries entities, least recently written entities are evicted first.
+    An entity is written anyway when its last write is older than ttl seconds :
+    this also recovers writes a deferred sink failed to deliver.
+    If a filename is given, the cache is saved on flush and close, and loaded at init.
+    """
+
+    def __init__(self, sink: Sink, max_entries: int = 100000, ttl: float = 3600.0, filename: str = None):
+        """
+        Parameters
+        ----------
+        sink : Sink
+            The wrapped sink, typically a SinkOrion
+        max_entries : int
+            Max number of entities in the cache
+        ttl : float
+            Max time in seconds an unchanged entity is skipped. None to skip it forever.
+        filename : str
+            File to persist the cache across restarts. None to keep it in memory only.
+        """
+        logger.debug("init SinkSkipUnchanged")
+        super().__init__(sink)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.filename = filename
+        self._cache = OrderedDict()  # (id, type) -> (digest, time of the last write)
+        self._lock = threading.Lock()
+        if filename and os.path.exists(filename):
+            self._load()
+        logger.info(f"{max_entries=} {ttl=} {filename=}")
+
+    @staticmethod
+    def _digest(entity: dict) -> str:
+        attrs = {k: v for k, v in entity.items() if k not in ("id", "type")}
+        return hashlib.blake2b(json.dumps(attrs, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"),
+                               digest_size=16).hexdigest()
+
+    def write(self, msg):
+        """Writes the message to the wrapped sink, unless the entity is unchanged
+
+        Parameters
+        ----------
+        msg: str
+            the NGSI data
+        """
+        try:
+            entity = msg if isinstance(msg, dict) else json.loads(msg)
+            key, digest = (entity["id"], entity.get("type")), self._digest(entity)
+        except Exception:  # not an entity
+            self.sink.write(msg)
+            return
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] == digest and (self.ttl is None or now - cached[1] < self.ttl):
+                logger.trace(f"skip unchanged entity {key}")
+                if self.stats:
+                    self.stats.skip()
+                return
+        self.sink.write(msg)
+        with self._lock:
+            self._cache[key] = (digest, now)
+            self._cache.move_to_end(key)
+            if len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+    def flush(self):
+        self.sink.flush()
+        if self.filename:
+            self._save()
+
+    def close(self):
+        if self.filename:
+            self._save()
+        self.sink.close()
+
+    def _load(self):
+        try:
+            with open(self.filename, encoding="utf-8") as f:
+                for id, type, digest, ts in json.load(f):
+                    self._cache[(id, type)] = (digest, ts)
+            logger.info(f"load {len(self._cache)} entities from {self.filename}")
+        except Exception as e:
+            logger.error(f"Cannot load cache from {self.filename} : {e}")
+
+    def _save(self):
+        with self._lock:
+            entries = [[*key, digest, ts]
+                       for key, (digest, ts) in self._cache.items()]
+        try:
+            with open(f"{self.filename}.tmp", "w", encoding="utf-8") as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(f"{self.filename}.tmp", self.filename)
+        except Exception as e:
+            logger.error(f"Cannot save cache to {self.filename} : {e}")
+
+
+class SinkSpool(SinkWrapper):
+    """Spool messages on disk before writing them to the wrapped sink
+
+    write() appends the message to a write-ahead log and returns, even if the wrapped sink is down.
+    The log is a sequence of segment files in the spool directory.
+    It is fsynced every fsync_every messages and at least every fsync_interval seconds.
+    A background thread drains the log to the wrapped sink, in order.
+    A failed write is retried with exponential backoff, until it succeeds or max_retries is reached.
+    Messages still spooled when the sink is closed are replayed when a SinkSpool is reopened on the same directory.
+
+    Delivery is at least once : after a crash, messages delivered since the last checkpoint are written again.
+    """
+
+    _HEADER = struct.Struct(">IId")  # payload length, crc32, timestamp
+
+    def __init__(self, sink: Sink, directory: str = "spool", segment_size: int = 16*2**20,
+                 fsync_every: int = 1000, fsync_interval: float = 1.0,
+                 retry_delay: float = 1.0, max_retry_delay: float = 60.0, max_retries: int = None,
+                 checkpoint_every: int = 100):
+        """
+        Parameters
+        ----------
+        sink : Sink
+            The wrapped sink, typically a SinkOrion
+        directory : str
+            The spool directory
+        segment_size : int
+            Max size of a segment file in bytes
+        fsync_every : int
+            Max number of messages written between two fsyncs
+        fsync_interval : float
+            Max time in seconds between two fsyncs
+        retry_delay : float
+            Delay in seconds before the first retry. Doubles at each retry.
+        max_retry_delay : float
+            Max delay in seconds between two retries
+        max_retries : int
+            Number of retries before a message is dropped. None to retry forever.
+        checkpoint_every : int
+            Number of messages delivered between two checkpoints of the drain position
+        """
+        logger.debug("init SinkSpool")
+        super().__init__(sink)
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_retries = max_retries
+        self.checkpoint_every = checkpoint_every
+        os.makedirs(directory, exist_ok=True)
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._retrying = False
+        self._error = None  # the exception that stopped the drain thread
+        self._head_ts = None  # timestamp of the message being delivered
+        # replay messages left by a previous run
+        seq, offset = self._load_checkpoint()
+        segments = self._segments()
+        for old in [s for s in segments if s < seq]:
+            os.remove(self._path(old))
+        segments = [s for s in segments if s >= seq]
+        if segments and segments[0] > seq:
+            seq, offset = segments[0], 0
+        self._pending = sum(1 for s in segments for _ in self._records(
+            s, offset if s == seq else 0))
+        # the writer always starts a new segment
+        self._seq = segments[-1] + 1 if segments else seq
+        if not segments:
+            seq, offset = self._seq, 0
+        self._file = open(self._path(self._seq), "ab")
+        self._size = 0
+        self._synced = 0  # size of the current segment visible to the drain thread
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._thread = threading.Thread(
+            target=self._drain, args=(seq, offset), daemon=True)
+        self._thread.start()
+        logger.info(f"{directory=} {segment_size=} {fsync_every=} {fsync_interval=}")
+        logger.info(f"{retry_delay=} {max_retry_delay=} {max_retries=}")
+        logger.info(f"replay {self._pending} spooled record(s)")
+
+    def write(self, msg):
+        """Appends the message to the spool
+
+        Parameters
+        ----------
+        msg: str
+            the NGSI data
+        """
+        data = (msg if isinstance(msg, str) else json.dumps(
+            msg, ensure_ascii=False)).encode("utf-8")
+        record = self._HEADER.pack(len(data), zlib.crc32(data), time.time()) + data
+        with self._cond:
+            if self._size and self._size + len(record) > self.segment_size:
+                self._rotate()
+            self._file.write(record)
+            self._size += len(record)
+            self._unsynced += 1
+            self._pending += 1
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def flush(self):
+        """Syncs the spool then waits for it to be drained, unless the wrapped sink is failing"""
+        with self._cond:
+            self._sync()
+            while self._pending and not self._retrying and self._thread.is_alive():
+                self._cond.wait()
+            if self._error:
+                raise SinkException(f"spool drain stopped : {self._error}")
+        self.sink.flush()
+
+    def status(self) -> dict:
+        status = self.sink.status()
+        status = dict(status) if isinstance(status, dict) else {}
+        with self._cond:
+            segments = self._segments()
+            status["spool"] = {
+                "pending": self._pending,
+                "segments": len(segments),
+                "bytes": sum(os.path.getsize(self._path(s)) for s in segments),
+                "lag": time.time() - self._head_ts if self._pending and self._head_ts else 0.0,
+                "retrying": self._retrying
+            }
+        return status
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            with self._cond:
+                self._stopped = True
+                self._cond.notify_all()
+            self._thread.join()
+            with self._cond:
+                self._sync()
+                self._file.close()
+            self.sink.close()
+
+    def _path(self, seq: int) -> str:
+        return os.path.join(self.directory, f"{seq:012d}.log")
+
+    def _segments(self):
+        return sorted(int(f[:-4]) for f in os.listdir(self.directory) if f.endswith(".log"))
+
+    def _load_checkpoint(self):
+        try:
+            with open(os.path.join(self.directory, "checkpoint")) as f:
+                seq, offset = f.read().split()
+                return int(seq), int(offset)
+        except FileNotFoundError:
+            return 0, 0
+
+    def _save_checkpoint(self, seq: int, offset: int):
+        filename = os.path.join(self.directory, "checkpoint")
+        with open(f"{filename}.tmp", "w") as f:
+            f.write(f"{seq} {offset}")
+        os.replace(f"{filename}.tmp", filename)
+
+    def _sync(self):
+        # the caller holds the lock
+        if self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+            self._synced = self._size
+            self._cond.notify_all()
+        self._last_sync = time.monotonic()
+
+    def _rotate(self):
+        # the caller holds the lock
+        self._sync()
+        self._file.close()
+        self._seq += 1
+        self._file = open(self._path(self._seq), "ab")
+        self._size = self._synced = 0
+        self._cond.notify_all()
+
+    def _wait(self, timeout: float) -> bool:
+        """Waits for the given timeout, syncing the spool when due. Returns False once stopped."""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while not self._stopped and (remaining := deadline - time.monotonic()) > 0:
+                self._cond.wait(min(remaining, self.fsync_interval))
+                if self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self._sync()
+            return not self._stopped
+
+    def _records(self, seq: int, offset: int, limit: int = None):
+        """Yields (end offset, timestamp, data) of the records of a segment, from offset up to limit"""
+        try:
+            f = open(self._path(seq), "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(offset)
+            while limit is None or offset < limit:
+                header = f.read(self._HEADER.size)
+                if len(header) < self._HEADER.size:
+                    break
+                length, crc, ts = self._HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length or zlib.crc32(data) != crc:
+                    logger.warning(
+                        f"Ignore truncated record in spool segment {seq}")
+                    break
+                offset += self._HEADER.size + length
+                yield offset, ts, data
+
+    def _deliver(self, data: bytes) -> bool:
+        """Writes the message to the wrapped sink, with retries. Returns False once stopped."""
+        attempt = 0
+        while True:
+            try:
+                self.sink.write(data.decode("utf-8"))
+                if self._retrying:
+                    logger.info("sink is back, drain the spool")
+                    with self._cond:
+                        self._retrying = False
+                return True
+            except Exception as e:
+                attempt += 1
+                if self.max_retries is not None and attempt > self.max_retries:
+                    logger.error(
+                        f"Cannot write record after {attempt} attempts : {e}")
+                    if self.stats:
+                        self.stats.reject()
+                    return True
+                delay = min(self.retry_delay * 2 ** (attempt-1),
+                            self.max_retry_delay)
+                logger.warning(
+                    f"Cannot write record, retry in {delay:.1f}s : {e}")
+                with self._cond:
+                    self._retrying = True
+                    self._cond.notify_all()
+                if not self._wait(delay):
+                    return False
+
+    def _drain(self, seq: int, offset: int):
+        delivered = 0
+        try:
+            while True:
+                with self._cond:
+                    if self._stopped:
+                        return
+                    current = seq == self._seq
+                    limit = self._synced if current else None
+                    if current and offset >= limit:  # wait for new messages
+                        self._cond.wait(self.fsync_interval)
+                        if self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+                            self._sync()
+                        continue
+                for end, ts, data in self._records(seq, offset, limit):
+                    self._head_ts = ts
+                    if not self._deliver(data):
+                        return
+                    offset = end
+                    delivered += 1
+                    with self._cond:
+                        self._pending -= 1
+                        self._cond.notify_all()
+                    if delivered % self.checkpoint_every == 0:
+                        self._save_checkpoint(seq, offset)
+                if not current:  # the segment is drained
+                    os.remove(self._path(seq))
+                    seq, offset = seq + 1, 0
+                    self._save_checkpoint(seq, offset)
+        except Exception as e:
+            logger.error(f"Spool drain stopped : {e}")
+            self._error = e
+        finally:
+            try:
+                self._save_checkpoint(seq, offset)
+            finally:
+                with self._cond:  # wake up flush()
+                    self._cond.notify_all()
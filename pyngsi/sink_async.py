@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+
+"""
+Async Sinks.
+
+Async Sinks are the asyncio counterpart of Sinks, intended to be used with NgsiAgentAsync.
+Each Async Sink Class MUST implement the coroutine write().
+Some Async Sinks MAY override the coroutine close() if needed to free resources.
+
+Any Sink can be turned into an Async Sink thanks to AsyncSinkAdapter.
+"""
+
+import asyncio
+
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+from pyngsi.sink import Sink, SinkHttp, SinkOrion, SinkException
+
+try:  # optional : pip install pyngsi[async]
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncSink(ABC):
+    """
+    AsyncSink is an abstract class
+
+    One can code its own AsyncSink just by extending AsyncSink.
+    """
+
+    stats = None  # statistics of the agent currently writing to the sink
+
+    @abstractmethod
+    async def write(self, msg):
+        pass
+
+    def bind(self, stats):
+        """Attach the statistics of the agent writing to the sink"""
+        self.stats = stats
+
+    async def flush(self):
+        pass
+
+    async def status(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class AsyncSinkAdapter(AsyncSink):
+    """Write to a synchronous Sink from a thread pool
+
+    Allows any existing Sink to be used by an async agent without blocking the event loop.
+    """
+
+    def __init__(self, sink: Sink, max_workers: int = 1):
+        """
+        Parameters
+        ----------
+        sink : Sink
+            The synchronous sink
+        max_workers : int
+            Number of threads calling the sink.
+            Keep the default for sinks that are not thread-safe (i.e. SinkFile).
+        """
+        self.sink = sink
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="sink")
+
+    def bind(self, stats):
+        super().bind(stats)
+        self.sink.bind(stats)
+
+    async def _call(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def write(self, msg):
+        await self._call(self.sink.write, msg)
+
+    async def flush(self):
+        await self._call(self.sink.flush)
+
+    async def status(self):
+        return await self._call(self.sink.status)
+
+    async def close(self):
+        await self._call(self.sink.close)
+        self._executor.shutdown()
+
+
+class AsyncSinkHttp(AsyncSink):
+    """Send to HTTP server using aiohttp
+
+    The target server is described by a SinkHttp : URLs, headers and proxy are taken from it.
+    Many requests share a pool of keep-alive connections.
+    """
+
+    def __init__(self, sink: SinkHttp = None, pool_maxsize: int = 100):
+        """
+        Parameters
+        ----------
+        sink : SinkHttp
+            The HTTP server configuration. Defaults to SinkHttp().
+        pool_maxsize : int
+            Max number of simultaneous connections
+        """
+        logger.debug("init AsyncSinkHttp")
+        if aiohttp is None:
+            raise SinkException(
+                "AsyncSinkHttp requires aiohttp : pip install pyngsi[async]")
+        self.config = sink if sink else SinkHttp()
+        self.pool_maxsize = pool_maxsize
+        self._session: "aiohttp.ClientSession" = None
+        logger.info(f"{pool_maxsize=}")
+
+    @property
+    def session(self) -> "aiohttp.ClientSession":
+        # the session must be created from within the event loop
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_maxsize))
+        return self._session
+
+    async def write(self, msg):
+        """Sends HTTP POST request with the NGSI data
+
+        Parameters
+        ----------
+        msg: str
+            the NGSI data
+        """
+        try:
+            async with self.session.post(self.config.post_url, data=msg,
+                                         headers=self.config.headers,
+                                         proxy=self.config.proxy) as r:
+                if r.status >= 400:
+                    text = await r.text()
+                    raise SinkException(
+                        f"cannot write to AsyncSinkHttp : {r.status} {r.reason}\nServer returned : {text}\nrecord={msg}")
+        except SinkException:
+            raise
+        except Exception as e:
+            raise SinkException(
+                f"cannot write to AsyncSinkHttp : {e}\nrecord={msg}")
+
+    async def status(self) -> dict:
+        logger.debug("ask http server status")
+        headers = self.config.headers.copy()
+        headers.pop('Content-Type', None)  # workaround unwanted Content-Type
+        try:
+            async with self.session.get(self.config.status_url, headers=headers,
+                                        proxy=self.config.proxy) as r:
+                r.raise_for_status()
+                return await r.json()
+        except Exception as e:
+            logger.error(e)
+            return {'state': 'Down or Unreachable'}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncSinkOrion(AsyncSinkHttp):
+    """Send to Orion Context Broker using aiohttp
+
+    Accepts the same keyword arguments as SinkOrion.
+    """
+
+    def __init__(self, pool_maxsize: int = 100, **kwargs):
+        logger.debug("init AsyncSinkOrion")
+        super().__init__(SinkOrion(**kwargs), pool_maxsize)
+
+    @classmethod
+    def from_config(cls, path: str = "orion.yml", pool_maxsize: int = 100):
+        return cls(pool_maxsize, **SinkOrion._load_config_from_yaml(path))
+
+    @classmethod
+    def from_dict(cls, config: dict, pool_maxsize: int = 100):
+        return cls(pool_maxsize, **SinkOrion._load_config_from_dict(config))
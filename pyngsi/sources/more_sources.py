@@ -2,13 +2,16 @@ import sys
 import time
 import random
 import openpyxl
+import numpy as np
 import pandas as pd
 
+from json.encoder import encode_basestring
 from pathlib import Path
 from loguru import logger
-from typing import Callable, List
+from typing import Callable, Dict, Iterator, List, Tuple, Union
 
 from pyngsi.sources.source import Source, Row
+from pyngsi.template import EntityTemplate, GEOJSON_PRECISION
 
 
 class SourceSampleOrion(Source):
@@ -94,3 +97,108 @@ class SourceDataFrame(Source):
     def __iter__(self):
         for row in self.df.itertuples():
             yield Row(self.provider, row)
+
+
+# a DataFrame column, or a pair of (latitude, longitude) columns for a geo:json attribute
+Column = Union[str, Tuple[str, str]]
+
+
+class SourceDataFrameNgsi(Source):
+    """A SourceDataFrameNgsi converts a pandas DataFrame into NGSI entities, column by column.
+
+    The shape of the entities is given by an EntityTemplate : each attribute is mapped to a column.
+    Values are formatted to JSON column by column, using numpy vectorized operations where the dtype allows it.
+    Then they fill the precomputed JSON skeleton of the template.
+    Rows hold serialized entities, ready to be written to a sink (i.e. SinkOrionBatch) without further processing.
+    Missing values (NaN, NaT) are serialized as null.
+
+    tpl = EntityTemplate("Room").add("temperature", "Number").add("location", "geo:json")
+    src = SourceDataFrameNgsi(df, tpl, id="room", columns={"location": ("lat", "lon")})
+    agent = NgsiAgent.create_agent(src, SinkOrionBatch())
+    """
+
+    def __init__(self, df: pd.DataFrame, template: EntityTemplate,
+                 id: Union[str, pd.Series],
+                 columns: Dict[str, Column] = None,
+                 batch_size: int = 10000,
+                 provider: str = "DataFrame"):
+        """Returns a SourceDataFrameNgsi instance.
+
+        Args:
+            df (DataFrame): the input data
+            template (EntityTemplate): the shape of the entities
+            id (str or Series): the column of the entity ids, or the ids themselves
+            columns (dict): maps attribute names to columns. Defaults to columns named after the attributes.
+            batch_size (int): number of rows converted at once
+            provider (str): the row provider. Defaults to "DataFrame".
+        """
+        self.df = df
+        self.builder = template.compile()
+        self.id = id
+        self.columns = columns if columns else {}
+        self.batch_size = batch_size
+        self.provider = provider
+
+    @staticmethod
+    def _null(values: np.ndarray, missing: np.ndarray) -> np.ndarray:
+        if missing.any():
+            values[missing] = "null"
+        return values
+
+    @staticmethod
+    def _number(col: pd.Series) -> np.ndarray:
+        values = col.to_numpy()
+        return SourceDataFrameNgsi._null(values.astype(str).astype(object), pd.isna(values))
+
+    def _encode(self, df: pd.DataFrame, name: str, ngsi_type: str, encoder: Callable) -> np.ndarray:
+        """Returns the JSON values of the attribute as an array of str"""
+        column = self.columns.get(name, name)
+        if ngsi_type == "geo:json" and isinstance(column, tuple):
+            lat, lon = (df[c] for c in column)
+            if pd.api.types.is_float_dtype(lat.dtype):
+                lat = lat.round(GEOJSON_PRECISION)
+            if pd.api.types.is_float_dtype(lon.dtype):
+                lon = lon.round(GEOJSON_PRECISION)
+            return '{"type": "Point", "coordinates": [' + self._number(lon) + ", " + self._number(lat) + "]}"
+        col = df[column]
+        dtype = col.dtype
+        if ngsi_type == "Number" and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype) \
+                and not pd.api.types.is_extension_array_dtype(dtype):
+            return self._number(col)
+        if ngsi_type == "Boolean" and pd.api.types.is_bool_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+            return np.where(col.to_numpy(), "true", "false").astype(object)
+        if ngsi_type == "DateTime" and pd.api.types.is_datetime64_any_dtype(dtype):
+            # the value datetime MUST be UTC
+            values = col.dt.tz_localize(None) if col.dt.tz else col
+            values = values.to_numpy(dtype="datetime64[s]")
+            strings = '"' + np.datetime_as_string(values, unit="s").astype(object) + 'Z"'
+            return self._null(strings, np.isnat(values))
+        if ngsi_type in ("Text", "URL", "Relationship") and pd.api.types.is_string_dtype(dtype):
+            values = col.to_numpy(dtype=object)
+            missing = pd.isna(values)
+            strings = np.full(len(values), "null", dtype=object)
+            strings[~missing] = [encode_basestring(v) for v in values[~missing]]
+            return strings
+        # no vectorized path for this column : encode value by value
+        return np.array(["null" if v is None or v != v else encoder(v) for v in col.to_numpy(dtype=object)],
+                        dtype=object)
+
+    def convert(self, df: pd.DataFrame) -> List[str]:
+        """Returns the serialized entities of the given DataFrame"""
+        ids = self.id.loc[df.index] if isinstance(
+            self.id, pd.Series) else df[self.id]
+        columns = [[encode_basestring(str(id)) for id in ids.to_numpy(dtype=object)]]
+        for name, ngsi_type, encoder in zip(self.builder.names, self.builder.types, self.builder.encoders):
+            columns.append(self._encode(df, name, ngsi_type, encoder))
+        skeleton = self.builder.skeleton
+        return [skeleton % values for values in zip(*columns)]
+
+    def batches(self) -> Iterator[List[str]]:
+        """Yields lists of serialized entities, batch_size at most"""
+        for start in range(0, len(self.df), self.batch_size):
+            yield self.convert(self.df.iloc[start:start+self.batch_size])
+
+    def __iter__(self):
+        for batch in self.batches():
+            for msg in batch:
+                yield Row(self.provider, msg)
@@ -1,25 +1,42 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import io
 import os
+import gzip
+import sys
 import json
+import errno
 import socket
 import signal
+import queue
+import select
+import selectors
+import threading
+import shutil
+import tempfile
 import time
 
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from cheroot.wsgi import Server as WSGIServer
 from loguru import logger
 from datetime import datetime
 from pathlib import Path
 from werkzeug.utils import secure_filename
+from typing import Callable, List
 
-from pyngsi.sources.source import Source, SourceStream, SourceSingle
-from pyngsi.sources.source_json import SourceJson
+from pyngsi.sources.source import Row, Source, SourceStream
+from pyngsi.sources.source_json import SourceJsonStream, SourceNdJson
 
+from pyngsi.utils.metrics import Metrics, CachedStatus, CONTENT_TYPE
+from pyngsi.utils.jobs import JobQueue, JobQueueFull, Job
 from pyngsi.__init__ import __version__ as version
 
+LINUX_SO_RXQ_OVFL = 40  # from <asm-generic/socket.h>, not exposed by the socket module
+SO_RXQ_OVFL = getattr(socket, "SO_RXQ_OVFL",
+                      LINUX_SO_RXQ_OVFL if sys.platform.startswith("linux") else None)
+
 
 class ServerException(Exception):
     pass
@@ -50,30 +67,57 @@ class Server():
     def close(self):
         pass
 
-    def _process_content(self, src: Source):
-        logger.info(f"{src=}")
-        from pyngsi.agent import NgsiAgentPull
+    def handle_signal(self, signum, frame):
+        pass
+
+    def _run_with_signals(self, loop: Callable):
+        """Runs the loop, handling SIGINT, SIGQUIT and SIGTERM from the main thread. Handlers are restored once done."""
+        handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGQUIT, signal.SIGTERM):
+                handlers[signum] = signal.signal(signum, self.handle_signal)
+        try:
+            loop()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def _process_content(self, src: Source, job: Job = None, skip_header: bool = None):
+        logger.debug(f"{src=}")
         if not src:
             logger.info("no source")
             return
         if not self.agent:
             logger.info("agent not set")
             return
+        stats = self.agent.Stats()
+        if job:  # report progress
+            job.stats = stats
         try:
-            if self.ignore_header:
-                src = src.skip_header()
-            agent = NgsiAgentPull(src, self.agent.sink,
-                                  self.agent.process, self.agent.side_effect)
-            logger.info(f"{self.ignore_header=}")
-            logger.info(f"{self.jsonpath=}")
-            agent.run()
-            agent.close()
-            if self.agent:
-                self.agent.stats += agent.stats
-            return agent.stats
+            if skip_header is None:
+                skip_header = self.ignore_header
+            self.agent.process_source(src.skip_header() if skip_header else src, stats)
         except Exception as e:
             logger.error(f"cannot parse content : {e}")
             raise ServerException("cannot parse content")
+        finally:
+            src.close()
+        return stats
+
+
+class _RawStream(io.RawIOBase):
+    """Adapts any object with a read() method, i.e. a WSGI input stream, to the io module"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def readable(self):
+        return True
+
+    def readinto(self, b) -> int:
+        data = self.stream.read(len(b))
+        b[:len(data)] = data
+        return len(data)
 
 
 class ServerHttpUpload(Server):
@@ -82,6 +126,10 @@ class ServerHttpUpload(Server):
 
     ServerHttpUpload handles raw binary (curl --data) and multipart/form-data (curl --form).
     ServerHttpUpload handles formats text and json.
+
+    By default the content is processed before responding.
+    Once set_async() is called, the content is saved to disk and queued as a job, and the server responds at once
+    with status 202 and the job id. The endpoint /jobs/<id> reports the progress and the statistics of the job.
     """
 
     def __init__(self,
@@ -92,7 +140,8 @@ class ServerHttpUpload(Server):
                  debug: bool = False,
                  provider: str = None,
                  ignore_header: bool = False,
-                 jsonpath: str = None):
+                 jsonpath: str = None,
+                 status_interval: float = 30.0):
 
         super().__init__(provider, ignore_header, jsonpath)
         self.host = host
@@ -100,14 +149,41 @@ class ServerHttpUpload(Server):
         self.wsgi_port = wsgi_port
         self.endpoint = endpoint
         self.debug = debug
+        self.status_interval = status_interval  # refresh interval of the remote status
+        self.remote_status = None
+        self.jobs: JobQueue = None  # set when processing asynchronously
+        self.upload_dir = None
 
         self.app = Flask(__name__)
         self.app.add_url_rule("/version", 'version',
                               self._version, methods=['GET'])
         self.app.add_url_rule("/status", 'status',
                               self._status, methods=['GET'])
+        self.app.add_url_rule("/metrics", 'metrics',
+                              self._metrics, methods=['GET'])
         self.app.add_url_rule(endpoint, 'upload',
                               self._upload, methods=['POST'])
+        self.app.add_url_rule("/jobs/<id>", 'job',
+                              self._job, methods=['GET'])
+
+    def set_async(self, workers: int = 2, max_pending: int = 16, max_finished: int = 1000, upload_dir: str = None):
+        """
+        Process uploads asynchronously
+
+        Parameters
+        ----------
+        workers : int
+            The number of uploads processed concurrently
+        max_pending : int
+            The number of uploads waiting to be processed. Beyond, uploads are rejected with status 503.
+        max_finished : int
+            The number of finished jobs whose status is kept
+        upload_dir : str
+            The directory where uploads are saved until processed. Defaults to the system temporary directory.
+        """
+        self.jobs = JobQueue(workers, max_pending, max_finished)
+        self.upload_dir = upload_dir
+        return self
 
     def run(self):
         logger.info(
@@ -131,20 +207,40 @@ class ServerHttpUpload(Server):
 
     def _status(self):
         logger.trace("ask for status")
-        remote_status = self.agent.sink.status()
+        status = {"server_status": self.agent.server_status,
+                  "ngsi_stats": self.agent.stats}
+        if self.agent.latency:
+            status["latency"] = self.agent.latency.to_dict()
+        if self.jobs:
+            status["jobs"] = self.jobs.gauges()
+        remote_status = self._remote_status()
         if remote_status:
-            return jsonify(server_status=self.agent.server_status,
-                           ngsi_stats=self.agent.stats,
-                           orion_status=remote_status)
-        else:
-            return jsonify(server_status=self.agent.server_status,
-                           ngsi_stats=self.agent.stats)
+            status["orion_status"] = remote_status
+        return jsonify(**status)
+
+    def _metrics(self):
+        logger.trace("ask for metrics")
+        metrics = Metrics()
+        metrics.add_calls(self.agent.server_status)
+        metrics.add_stats(self.agent.stats)
+        metrics.add_latency(self.agent.latency)
+        if self.jobs:
+            metrics.add_jobs(self.jobs.gauges())
+        metrics.add_remote_status(self._remote_status())
+        return Response(metrics.text(), content_type=CONTENT_TYPE)
+
+    def _remote_status(self):
+        """Returns the last status of the sink, refreshed in the background"""
+        if self.remote_status is None:
+            self.remote_status = CachedStatus(
+                self.agent.sink.status, self.status_interval)
+        return self.remote_status.get()
 
     def _upload(self):
         
         if self.agent:
             self.agent.server_status.lastcalltime = datetime.now()
-            self.agent.server_status.calls += 1
+            self.agent.server_status.count("calls")
 
         logger.info("received request")
 
@@ -154,21 +250,80 @@ class ServerHttpUpload(Server):
 
         except Exception as e:
             if self.agent:
-                self.agent.server_status.calls_error += 1
-            return jsonify({'status': 400, 'message': e})
+                self.agent.server_status.count("calls_error")
+            return jsonify({'status': 400, 'message': str(e)})
 
         logger.info(src)
-        stats = self._process_content(src)
+        if self.jobs:
+            return self._submit(src, filename)
+        try:
+            stats = self._process_content(src)
+        except ServerException as e:
+            if self.agent:
+                self.agent.server_status.count("calls_error")
+            return jsonify(status=400, message=str(e))
+        finally:
+            self._remove(filename)
+
+        if self.agent:
+            self.agent.server_status.count("calls_success")
+        #return jsonify({'status': 200, 'message': 'content uploaded successfully'})
+        return jsonify(status=200, message="content uploaded successfully", statistics=stats)
+
+    def _submit(self, src: Source, filename: str):
+        def run(job: Job):
+            try:
+                stats = self._process_content(src, job)
+            except ServerException:
+                if self.agent:
+                    self.agent.server_status.count("calls_error")
+                raise
+            finally:
+                self._remove(filename)
+            if self.agent:
+                self.agent.server_status.count("calls_success")
+            return stats
+
+        try:
+            job = self.jobs.submit(run)
+        except JobQueueFull as e:
+            src.close()
+            self._remove(filename)
+            if self.agent:
+                self.agent.server_status.count("calls_error")
+            response = jsonify(status=503, message=str(e))
+            response.headers["Retry-After"] = "1"
+            return response, 503
+        return jsonify(status=202, message="content queued", job=job.id), 202, {"Location": f"/jobs/{job.id}"}
+
+    def _job(self, id: str):
+        job = self.jobs.get(id) if self.jobs else None
+        if not job:
+            return jsonify(status=404, message=f"unknown job {id}"), 404
+        return jsonify(job.to_dict())
+
+    @staticmethod
+    def _remove(filename: str):
         if filename:
             try:
                 os.remove(filename)
             except Exception as e:
                 logger.warning(f"Cannot remove file {filename}: {e}")
 
-        if self.agent:
-            self.agent.server_status.calls_success += 1
-        #return jsonify({'status': 200, 'message': 'content uploaded successfully'})
-        return jsonify(status=200, message="content uploaded successfully", statistics=stats)
+    def _save(self, stream, suffix: str = None):
+        """Saves the binary stream to a temporary file, returns the file and its name"""
+        fd, filename = tempfile.mkstemp(
+            prefix="pyngsi-upload-", suffix=suffix, dir=self.upload_dir)
+        f = open(fd, "w+b")
+        shutil.copyfileobj(_RawStream(stream), f)
+        f.seek(0)
+        return f, filename
+
+    def close(self):
+        if self.jobs:
+            self.jobs.close()
+        if self.remote_status:
+            self.remote_status.stop()
 
     def _create_source(self, request: request):
         src: Source = None
@@ -184,39 +339,69 @@ class ServerHttpUpload(Server):
             logger.debug(f"{ext=}")
             if ext in Source.registered_extensions:  # extension registred by user
                 klass, kwargs = Source.registered_extensions[ext]
-                filename = secure_filename(filename)
-                file.save(filename)
+                if self.jobs:  # a unique name : uploads of a same file may be queued
+                    f, filename = self._save(
+                        file.stream, suffix=f"-{secure_filename(filename)}")
+                    f.close()
+                else:
+                    filename = secure_filename(filename)
+                    file.save(filename)
                 src = klass(filename, **kwargs)
-            elif ext not in ("txt", "csv", "json"):
-                raise ServerException(f"unknown extension {ext}")
-            elif ext == 'json':  # JSON extension
-                filename = None # here we don't save the file
-                data = json.load(file)
-                src = SourceJson(data, provider=provider,
-                                 jsonpath=self.jsonpath)
-            else:  # processed as text
-                filename = None # here we don't save the file
-                data = file.read().decode('utf-8')
-                src = SourceStream(data.splitlines(), provider=provider)
-        else:  # raw binary
+            else:
+                # the file is decoded and parsed on the fly
+                filename = None  # here we don't save the file
+                gzipped = ext.endswith(".gz") or ext == "gz"
+                ext = ext[:-3] if gzipped else ext
+                if ext not in ("txt", "csv", "json", "jsonl", "ndjson"):
+                    raise ServerException(f"unknown extension {ext}")
+                stream = file.stream
+                if self.jobs:  # the request ends before the job runs
+                    stream, filename = self._save(stream)
+                stream = self._text_stream(stream, gzipped)
+                if ext == 'json':  # JSON extension
+                    src = SourceJsonStream(stream, provider=provider,
+                                           jsonpath=self.jsonpath)
+                elif ext in ("jsonl", "ndjson"):  # JSON Lines
+                    src = SourceNdJson(stream, provider=provider)
+                else:  # processed as text
+                    src = SourceStream(stream, provider=provider)
+        else:  # raw binary, decoded and parsed on the fly
+            gzipped = request.content_encoding == "gzip"
+            stream = request.stream
+            if self.jobs:  # the request ends before the job runs
+                stream, filename = self._save(stream)
+            stream = self._text_stream(stream, gzipped)
             if request.is_json:
                 logger.info("request is json")
-                data = request.get_json()
-                src = SourceJson(data, provider=self.provider,
-                                 jsonpath=self.jsonpath)
+                src = SourceJsonStream(stream, provider=self.provider,
+                                       jsonpath=self.jsonpath)
             else:
                 logger.info("request is plain text")
-                data = request.get_data().decode("utf-8", errors="replace")
-                src = SourceStream(data.splitlines())
+                src = SourceStream(stream)
 
         return src, filename
 
+    @staticmethod
+    def _text_stream(stream, gzipped: bool = False) -> io.TextIOBase:
+        """Returns a text stream that decompresses and decodes the binary stream as it is read"""
+        if not isinstance(stream, io.BufferedIOBase):
+            stream = io.BufferedReader(_RawStream(stream))
+        if gzipped:
+            stream = gzip.GzipFile(fileobj=stream, mode="rb")
+        return io.TextIOWrapper(stream, encoding="utf-8", errors="replace")
+
 
 class ServerUdp(Server):
     """
     ServerUdp allows receiving UDP frames
 
     A typical use case is to gather NMEA data from an AIS-receiver.
+
+    The socket is drained in batches : once a datagram is available, up to batch_size datagrams are read
+    without blocking then processed at once by the agent.
+    The server counts the datagrams dropped by the kernel when the receive buffer overflows (Linux only),
+    and the datagrams truncated being larger than bufsize. These counters are part of the agent status.
+    When ignore_header is set, only the very first datagram is skipped.
     """
 
     def __init__(self,
@@ -224,7 +409,9 @@ class ServerUdp(Server):
                  port: int = 10110,
                  bufsize: int = 1024,
                  provider: str = "UDP Server",
-                 ignore_header: bool = False):
+                 ignore_header: bool = False,
+                 batch_size: int = 256,
+                 rcvbuf: int = None):
         """
         Parameters
         ----------
@@ -233,48 +420,104 @@ class ServerUdp(Server):
         port : int
             The server port
         bufsize : int
-            Buffer size
+            Buffer size, i.e. the maximum size of a datagram
+        batch_size : int
+            The maximum number of datagrams processed at once
+        rcvbuf : int
+            The size of the socket receive buffer (SO_RCVBUF). Defaults to the system default.
         """
         super().__init__(provider, ignore_header)
         self.hostname = host
         self.port = port
         self.bufsize = bufsize
+        self.batch_size = batch_size
         self.interrupted = False
+        self.datagrams = 0  # datagrams received
+        self.dropped = 0  # datagrams dropped by the kernel, the receive buffer being full
+        self.truncated = 0  # datagrams larger than bufsize
 
         logger.info(f"init UDP server addr = {host}:{port}")
         self.s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if rcvbuf:
+            self.s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        try:  # the kernel then tells the number of dropped datagrams
+            self.s.setsockopt(socket.SOL_SOCKET, SO_RXQ_OVFL, 1)
+            self.ancbufsize = socket.CMSG_SPACE(4)
+        except (OSError, TypeError):
+            logger.info("dropped datagrams are not counted on this platform")
+            self.ancbufsize = 0
         self.s.bind((host, port))
+        self.s.setblocking(False)
         logger.info(f"UDP server started")
-        signal.signal(signal.SIGINT, self.handle_signal)
-        signal.signal(signal.SIGQUIT, self.handle_signal)
-        signal.signal(signal.SIGTERM, self.handle_signal)
 
     def run(self):
+        self._run_with_signals(self._loop)
+
+    def _loop(self):
         logger.info("ready...")
         self.agent.server_status.starttime = datetime.now()
         while not self.interrupted:
-            logger.info("receiving...")
+            frames = []
             try:
-                data, addr = self.s.recvfrom(self.bufsize)
-                logger.info(f"received UDP message from {addr} : {data}")
-                if self.agent:
+                readable, _, _ = select.select([self.s], [], [], 1.0)
+                if not readable:
+                    continue
+                frames = self._receive()
+                if self.agent:  # calls are counted in datagrams
                     self.agent.server_status.lastcalltime = datetime.now()
-                    self.agent.server_status.calls += 1
-                src: Source = SourceSingle(
-                    data.decode('utf-8'), provider=self.provider)
-                self._process_content(src)
+                    self.agent.server_status.count("calls", len(frames))
+                if self.ignore_header and self.datagrams == len(frames):  # the header is the first datagram
+                    frames = frames[1:]
+                src: Source = Source([Row(self.provider, frame.decode('utf-8', errors="replace"))
+                                      for frame in frames])
+                self._process_content(src, skip_header=False)
                 if self.agent:
-                    self.agent.server_status.calls_success += 1
+                    self.agent.server_status.count("calls_success", len(frames))
             except Exception as e:
                 if not self.interrupted:
                     logger.error(e)
                     if self.agent:
-                        self.agent.server_status.calls_error += 1
+                        self.agent.server_status.count("calls_error", len(frames))
+
+    def _receive(self) -> list:
+        """Reads up to batch_size datagrams without blocking"""
+        frames = []
+        while len(frames) < self.batch_size:
+            try:
+                if hasattr(self.s, "recvmsg"):
+                    data, ancdata, flags, addr = self.s.recvmsg(
+                        self.bufsize, self.ancbufsize)
+                else:  # Windows
+                    (data, addr), ancdata, flags = self.s.recvfrom(self.bufsize), [], 0
+            except BlockingIOError:
+                break
+            except OSError as e:  # keep the datagrams already read
+                logger.warning(f"cannot receive datagram : {e}")
+                if e.errno != errno.EMSGSIZE:
+                    break
+                self.truncated += 1  # on Windows, a datagram larger than bufsize is an error
+                continue
+            logger.trace(f"received UDP message from {addr} : {data}")
+            for level, type, value in ancdata:
+                if level == socket.SOL_SOCKET and type == SO_RXQ_OVFL:
+                    dropped = int.from_bytes(value[:4], sys.byteorder)  # cumulative count
+                    if dropped > self.dropped:
+                        logger.warning(
+                            f"{dropped - self.dropped} datagrams dropped : the receive buffer is full")
+                    self.dropped = dropped
+            if flags & socket.MSG_TRUNC:
+                self.truncated += 1
+            frames.append(data)
+        self.datagrams += len(frames)
+        return frames
+
+    def status(self) -> dict:
+        return {"datagrams": self.datagrams, "dropped": self.dropped, "truncated": self.truncated}
 
     def close(self):
         self.s.close()
-        logger.info(f"UDP server closed")
+        logger.info(f"UDP server closed : {self.status()}")
 
     def handle_signal(self, signum, frame):
         """Properly clean resources when a signal is received"""
@@ -283,3 +526,199 @@ class ServerUdp(Server):
         self.interrupted = True
         self.s.close()
         time.sleep(1)
+
+
+class _Connection:
+    """A TCP client of a ServerTcp"""
+
+    def __init__(self, sock: socket.socket, provider: str, skip_header: bool):
+        self.sock = sock
+        self.provider = provider
+        self.skip_header = skip_header
+        self.buffer = bytearray()  # the incomplete line received so far
+
+
+class ServerTcp(Server):
+    """
+    ServerTcp receives newline-delimited records (i.e. NMEA sentences, CSV lines) from TCP clients
+
+    A single thread serves all the clients with a selector, and hands the lines received to a worker thread
+    feeding the agent. The provider of a row tells its connection : "provider@host:port".
+    When the agent falls behind and max_pending batches of lines are waiting, the server stops reading the sockets.
+    TCP flow control then slows the clients down.
+    When ignore_header is set, the first line of each connection is skipped.
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 10110,
+                 bufsize: int = 65536,
+                 max_pending: int = 64,
+                 max_line: int = 65536,
+                 provider: str = "TCP Server",
+                 ignore_header: bool = False):
+        """
+        Parameters
+        ----------
+        host : str
+            The server hostname
+        port : int
+            The server port
+        bufsize : int
+            The size of the receive buffer
+        max_pending : int
+            The number of batches of lines waiting for the agent. Beyond, the sockets are not read.
+        max_line : int
+            The maximum length of a line. Longer lines are discarded.
+        """
+        super().__init__(provider, ignore_header)
+        self.hostname = host
+        self.port = port
+        self.max_line = max_line
+        self.interrupted = False
+        self.connections = 0  # connections accepted
+        self.active = 0  # connections open
+        self.lines = 0  # lines received
+        self.bytes = 0  # bytes received
+        self.stalls = 0  # times the server stopped reading, the agent falling behind
+        self.overlong = 0  # lines discarded, being longer than max_line
+        self._buf = bytearray(bufsize)
+        self._view = memoryview(self._buf)
+        self._queue = queue.Queue(max_pending)
+        self._selector = selectors.DefaultSelector()
+
+        logger.info(f"init TCP server addr = {host}:{port}")
+        self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.s.bind((host, port))
+        self.s.listen()
+        self.s.setblocking(False)
+        self._selector.register(self.s, selectors.EVENT_READ)
+        logger.info(f"TCP server started")
+
+    def run(self):
+        logger.info("ready...")
+        self.agent.server_status.starttime = datetime.now()
+        worker = threading.Thread(target=self._work)
+        worker.start()
+        try:
+            self._run_with_signals(self._loop)
+        finally:
+            self._queue.put(None)  # the worker processes the pending lines then stops
+            worker.join()
+
+    def _loop(self):
+        while not self.interrupted:
+            try:
+                events = self._selector.select(1.0)
+            except OSError:  # the server is closed
+                break
+            for key, _ in events:
+                if key.data is None:
+                    self._accept()
+                else:
+                    self._read(key.data)
+
+    def _accept(self):
+        try:
+            sock, (host, port) = self.s.accept()
+        except BlockingIOError:
+            return
+        sock.setblocking(False)
+        conn = _Connection(sock, f"{self.provider}@{host}:{port}", self.ignore_header)
+        self._selector.register(sock, selectors.EVENT_READ, conn)
+        self.connections += 1
+        self.active += 1
+        logger.info(f"{conn.provider} connected")
+
+    def _read(self, conn: _Connection):
+        try:
+            n = conn.sock.recv_into(self._buf)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            logger.warning(f"{conn.provider} : {e}")
+            n = 0
+        if not n:  # the client disconnected
+            if conn.buffer:  # the last line has no newline
+                self._submit(conn, [conn.buffer.decode("utf-8", errors="replace")])
+            self._disconnect(conn)
+            return
+        self.bytes += n
+        data = self._view[:n]
+        end = self._buf.rfind(b"\n", 0, n)
+        if end < 0:  # no complete line yet
+            conn.buffer += data
+            if len(conn.buffer) > self.max_line:
+                logger.warning(f"{conn.provider} : line longer than {self.max_line} discarded")
+                self.overlong += 1
+                conn.buffer.clear()
+            return
+        if conn.buffer:  # complete the pending line
+            conn.buffer += data[:end]
+            text = conn.buffer.decode("utf-8", errors="replace")
+            conn.buffer.clear()
+        else:  # decoded straight from the receive buffer
+            text = str(data[:end], "utf-8", "replace")
+        conn.buffer += data[end + 1:]
+        self._submit(conn, [line.rstrip("\r") for line in text.split("\n")])
+
+    def _submit(self, conn: _Connection, lines: List[str]):
+        if conn.skip_header:
+            conn.skip_header = False
+            lines = lines[1:]
+        if not lines:
+            return
+        self.lines += len(lines)
+        if self.agent:
+            self.agent.server_status.lastcalltime = datetime.now()
+            self.agent.server_status.count("calls", len(lines))
+        batch = (conn.provider, lines)
+        try:
+            self._queue.put_nowait(batch)
+        except queue.Full:  # backpressure : no socket is read until the agent catches up
+            self.stalls += 1
+            logger.debug("the agent falls behind : stop reading")
+            while not self.interrupted:
+                try:
+                    self._queue.put(batch, timeout=1.0)
+                    break
+                except queue.Full:
+                    pass
+
+    def _work(self):
+        while (batch := self._queue.get()) is not None:
+            provider, lines = batch
+            try:
+                self._process_content(Source([Row(provider, line) for line in lines]), skip_header=False)
+                if self.agent:
+                    self.agent.server_status.count("calls_success", len(lines))
+            except Exception as e:
+                logger.error(e)
+                if self.agent:
+                    self.agent.server_status.count("calls_error", len(lines))
+
+    def _disconnect(self, conn: _Connection):
+        self._selector.unregister(conn.sock)
+        conn.sock.close()
+        self.active -= 1
+        logger.info(f"{conn.provider} disconnected")
+
+    def status(self) -> dict:
+        return {"connections": self.connections, "active": self.active, "lines": self.lines,
+                "bytes": self.bytes, "stalls": self.stalls, "overlong": self.overlong,
+                "pending": self._queue.qsize()}
+
+    def close(self):
+        for key in list(self._selector.get_map().values()):
+            if key.data is not None:
+                self._disconnect(key.data)
+        self._selector.close()
+        self.s.close()
+        logger.info(f"TCP server closed : {self.status()}")
+
+    def handle_signal(self, signum, frame):
+        """Stops the loop when a signal is received"""
+        logger.info("Received SIGNAL : ")
+        logger.info("Stopping loop...")
+        self.interrupted = True
@@ -14,17 +14,21 @@ import gzip
 import json
 import time
 import glob
+import threading
+import multiprocessing
 
 from dataclasses import dataclass
 from collections.abc import Iterable
 from loguru import logger
 from os.path import basename
 from typing import List, Callable, Tuple, Any, Sequence
-from more_itertools import take
+from more_itertools import take, chunked
 from itertools import islice, chain
 from zipfile import ZipFile
 from io import TextIOWrapper
 from pathlib import Path
+from queue import Queue, Full
+from multiprocessing.pool import ThreadPool
 
 from pyngsi.utils.stream import stream_from
 
@@ -90,8 +94,8 @@ class Source(Iterable):
 
     @classmethod
     def from_file(cls, filename: str, provider: str = "user", **kwargs):
-        from pyngsi.sources.source_json import SourceJson
-        """automatically create the Source from a filename, figuring out the extension, handles text, json and gzip compression"""
+        from pyngsi.sources.source_json import SourceJsonStream, SourceNdJson
+        """automatically create the Source from a filename, figuring out the extension, handles text, json, ndjson and gzip compression"""
         if "*" in cls.registered_extensions:
             klass, kwargs = cls.registered_extensions["*"]
             return klass(filename, **kwargs)
@@ -102,25 +106,30 @@ class Source(Iterable):
         stream, suffixes = stream_from(filename)
         ext = suffixes[-1]
         if ext == ".json":
-            json_obj = json.load(stream)
-            return SourceJson(json_obj, provider=basename(filename), **kwargs)
+            return SourceJsonStream(stream, provider=basename(filename), **kwargs)
+        if ext in (".jsonl", ".ndjson"):
+            return SourceNdJson(stream, provider=basename(filename), **kwargs)
         return SourceStream(stream, provider=basename(filename), **kwargs)
 
     @classmethod
-    def from_files(cls, filenames: Sequence[str], provider: str = "user", **kwargs):
-        sources = [Source.from_file(f) for f in filenames]
-        return SourceMany(sources)
+    def from_files(cls, filenames: Sequence[str], provider: str = "user", workers: int = None, **kwargs):
+        """create the Source from many files, read by a pool of workers if workers is given (see SourceParallel)"""
+        if workers:
+            return SourceParallel(filenames, workers, **kwargs)
+        return SourceFiles(filenames, **kwargs)
 
     @classmethod
-    def from_glob(cls, pattern: str, provider: str = "user", **kwargs):
-        sources = [Source.from_file(f) for f in glob.glob(pattern)]
-        return SourceMany(sources)
+    def from_glob(cls, pattern: str, provider: str = "user", workers: int = None, **kwargs):
+        if workers:
+            return SourceParallel(glob.iglob(pattern), workers, **kwargs)
+        return SourceFiles(glob.iglob(pattern), **kwargs)
 
     @classmethod
-    def from_globs(cls, patterns: Sequence[str], provider: str = "user", **kwargs):
-        filenames = chain.from_iterable([glob.glob(p) for p in patterns])
-        sources = [Source.from_file(f) for f in filenames]
-        return SourceMany(sources)
+    def from_globs(cls, patterns: Sequence[str], provider: str = "user", workers: int = None, **kwargs):
+        filenames = chain.from_iterable(glob.iglob(p) for p in patterns)
+        if workers:
+            return SourceParallel(filenames, workers, **kwargs)
+        return SourceFiles(filenames, **kwargs)
 
     @classmethod
     def register_extension(cls, ext: str, src, **kwargs):
@@ -165,6 +174,10 @@ class SourceStream(Source):
     def reset(self):
         pass
 
+    def close(self):
+        if self.stream is not sys.stdin and (close := getattr(self.stream, "close", None)):
+            close()
+
 
 class SourceStdin(SourceStream):
 
@@ -196,3 +209,154 @@ class SourceMany(Source):
     def __iter__(self):
         for src in self.sources:
             yield from src
+
+
+class SourceFiles(Source):
+
+    """
+    A SourceFiles reads many files one after the other.
+
+    Each file is opened only when the iteration reaches it, and closed as soon as it is read.
+    At most one file is open at a time, whatever the number of files.
+    """
+
+    def __init__(self, filenames: Iterable[str], **kwargs):
+        self.filenames = filenames
+        self.kwargs = kwargs
+
+    def __iter__(self):
+        for filename in self.filenames:
+            src = Source.from_file(filename, **self.kwargs)
+            try:
+                yield from src
+            finally:
+                if close := getattr(src, "close", None):
+                    close()
+
+
+# set in each worker process of a SourceParallel
+_reader_queue = None
+_reader_stop = None
+
+
+def _init_reader(queue, stop):
+    global _reader_queue, _reader_stop
+    _reader_queue = queue
+    _reader_stop = stop
+
+
+def _put(queue, stop, item) -> bool:
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=0.1)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _read_file(index: int, filename: str, chunksize: int, kwargs: dict, queue=None, stop=None):
+    """Reads a file in a worker and sends its rows by chunks. An empty chunk marks the end of the file."""
+    if queue is None:
+        queue, stop = _reader_queue, _reader_stop
+    src = None
+    try:
+        src = Source.from_file(filename, **kwargs)
+        for chunk in chunked(src, chunksize):
+            if not _put(queue, stop, (index, chunk)):
+                return
+    except Exception as e:
+        logger.error(f"Cannot read file {filename} : {e}")
+    finally:
+        if src is not None:
+            src.close()
+    _put(queue, stop, (index, []))
+
+
+class SourceParallel(Source):
+
+    """
+    A SourceParallel reads many files in a pool of workers.
+
+    Each file is opened only when a worker picks it. It is decompressed and parsed in the worker, as in Source.from_file().
+    Rows are sent by chunks through a bounded queue, keeping their per-file provider name.
+    Rows of a same file are always delivered in order.
+    When ordered is False, rows of different files are interleaved as they come.
+    When ordered is True, files are delivered one after the other in the given order, next files being read ahead.
+
+    Use worker processes (the default) when parsing dominates, i.e. JSON files.
+    Use threads (processes=False) when decompression and I/O dominate : zlib releases the GIL.
+    """
+
+    def __init__(self, filenames: Iterable[str], workers: int = None, processes: bool = True,
+                 ordered: bool = False, chunksize: int = 1000, queue_size: int = 64, **kwargs):
+        self.filenames = filenames
+        self.workers = workers if workers else multiprocessing.cpu_count()
+        self.processes = processes
+        self.ordered = ordered
+        self.chunksize = chunksize
+        self.queue_size = queue_size
+        self.kwargs = kwargs
+        logger.info(
+            f"{self.workers=} {processes=} {ordered=} {chunksize=} {queue_size=}")
+
+    def __iter__(self):
+        if self.processes:
+            queue, stop = multiprocessing.Queue(
+                self.queue_size), multiprocessing.Event()
+            pool = multiprocessing.Pool(
+                self.workers, initializer=_init_reader, initargs=(queue, stop))
+            args = ()
+        else:
+            queue, stop = Queue(self.queue_size), threading.Event()
+            pool = ThreadPool(self.workers)
+            args = (queue, stop)
+        files = enumerate(self.filenames)
+        submitted = 0
+        current = 0  # when ordered, the index of the file being delivered
+
+        def submit() -> bool:
+            nonlocal submitted
+            if self.ordered and submitted >= current + self.workers:  # bound the files read ahead
+                return False
+            for index, filename in islice(files, 1):
+                submitted += 1
+                def failed(e, index=index):
+                    logger.error(f"Cannot read file {filename} : {e}")
+                    queue.put((index, []))
+                pool.apply_async(_read_file, (index, filename, self.chunksize, self.kwargs, *args),
+                                 error_callback=failed)
+                return True
+            return False
+
+        inflight = sum(submit() for _ in range(self.workers))
+        pending = {}  # when ordered, the chunks read ahead from next files
+        done = set()  # when ordered, the next files completely read
+        try:
+            while inflight:
+                index, chunk = queue.get()
+                if chunk:
+                    if not self.ordered or index == current:
+                        yield from chunk
+                    else:
+                        pending.setdefault(index, []).append(chunk)
+                    continue
+                # end of file
+                inflight -= 1
+                if self.ordered:
+                    done.add(index)
+                    while current in done:
+                        done.remove(current)
+                        current += 1
+                        for chunk in pending.pop(current, []):
+                            yield from chunk
+                while inflight < self.workers and submit():
+                    inflight += 1
+        except BaseException:  # the consumer stopped early (GeneratorExit) or failed
+            stop.set()
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
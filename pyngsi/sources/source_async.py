@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Async Sources for NgsiAgentAsync to collect from.
+
+Any async iterable of rows is an Async Source.
+A synchronous Source is turned into an Async Source thanks to AsyncSourceAdapter.
+"""
+
+import asyncio
+import threading
+
+from collections.abc import AsyncIterable
+from loguru import logger
+
+from pyngsi.sources.source import Row, Source
+
+_EOT = object()  # End Of Transmission
+
+
+class AsyncSourceAdapter(AsyncIterable):
+    """
+    An AsyncSourceAdapter iterates a synchronous Source in a dedicated thread.
+
+    Rows are handed to the event loop through a bounded queue.
+    Blocking sources (i.e. SourceMqtt) do not block the event loop.
+    """
+
+    def __init__(self, source: Source, maxsize: int = 1000):
+        """
+        Parameters
+        ----------
+        source : Source
+            The synchronous source
+        maxsize : int
+            Max number of rows read ahead
+        """
+        self.source = source
+        self.maxsize = maxsize
+
+    def _produce(self, loop: asyncio.AbstractEventLoop, queue: asyncio.Queue):
+        def put(item):
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        try:
+            for row in self.source:
+                put(row)
+        except Exception as e:
+            logger.error(f"Cannot read source : {e}")
+        finally:
+            put(_EOT)
+
+    async def __aiter__(self):
+        queue = asyncio.Queue(self.maxsize)
+        thread = threading.Thread(target=self._produce, args=(asyncio.get_running_loop(), queue),
+                                  daemon=True)
+        thread.start()
+        while (row := await queue.get()) is not _EOT:
+            yield row
+
+    def reset(self):
+        self.source.reset()
+
+    def close(self):
+        self.source.close()
@@ -5,7 +5,7 @@ import sys
 import json
 import gzip
 
-from typing import Tuple, List, Callable
+from typing import Any, Iterable, Iterator, Tuple, List, Callable, TextIO
 from loguru import logger
 from os.path import basename
 from zipfile import ZipFile
@@ -45,3 +45,134 @@ class SourceJson(Source):
 
     def reset(self):
         pass
+
+
+class JsonStreamReader:
+    """Decode JSON values incrementally from a text stream
+
+    Only the values the caller asks for are materialized : the elements of an array are decoded one at a time.
+    """
+
+    def __init__(self, stream: TextIO, chunk_size: int = 65536):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self._decoder = json.JSONDecoder()
+
+    def _read(self, size: int) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self.chunk_size:  # drop consumed data
+            self.buf, self.pos = self.buf[self.pos:], 0
+        self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        """Returns the next non-whitespace character without consuming it, empty string at the end of the stream"""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buf) or not self._read(self.chunk_size):
+                return self.buf[self.pos:self.pos+1]
+
+    def expect(self, c: str):
+        if self.peek() != c:
+            raise json.JSONDecodeError(
+                f"Expecting '{c}'", self.buf, self.pos)
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decodes the next value"""
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+                # a value is complete once followed by a delimiter, i.e. a number could be truncated
+                if self.eof or (end < len(self.buf) and self.buf[end] in " \t\r\n,:]}"):
+                    self.pos = end
+                    return obj
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read(size)
+            size *= 2  # large values need fewer attempts
+
+    def find(self, key: str) -> bool:
+        """Moves to the value of the given key of the current object"""
+        self.expect("{")
+        while self.peek() != "}":
+            k = self.value()
+            self.expect(":")
+            if k == key:
+                return True
+            self.value()  # skip
+            if self.peek() == ",":
+                self.pos += 1
+        return False
+
+    def items(self) -> Iterator[Any]:
+        """Iterates on the elements of the current array"""
+        self.expect("[")
+        while self.peek() != "]":
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+        self.pos += 1
+
+
+class SourceJsonStream(Source):
+    """Read JSON formatted data from a text stream, incrementally
+
+    When the JSON document (or the value targeted by the jsonpath) is an array,
+    rows are emitted as the elements are read : the whole document is never held in memory.
+    Behaves as SourceJson otherwise.
+    """
+
+    def __init__(self, stream: TextIO, provider: str = "user", jsonpath: str = None, chunk_size: int = 65536):
+        self.stream = stream
+        self.provider = provider
+        self.path = jsonpath
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        reader = JsonStreamReader(self.stream, self.chunk_size)
+        path = self.path.split('.') if self.path else []
+        for p in path:
+            if not reader.find(p):
+                yield Row(self.provider, None)
+                return
+        if reader.peek() == "[":
+            for obj in reader.items():
+                yield Row(self.provider, obj)
+        else:
+            yield Row(self.provider, reader.value())
+
+    def close(self):
+        self.stream.close()
+
+
+class SourceNdJson(Source):
+    """Read newline-delimited JSON (NDJSON, JSON Lines) from a text stream
+
+    Each non-empty line is a JSON document that is emitted as a row.
+    """
+
+    def __init__(self, stream: Iterable[str], provider: str = "user"):
+        self.stream = stream
+        self.provider = provider
+
+    def __iter__(self):
+        for line in self.stream:
+            if line.strip():
+                yield Row(self.provider, json.loads(line))
+
+    def close(self):
+        if close := getattr(self.stream, "close", None):
+            close()
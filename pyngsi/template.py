@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Entity templates.
+
+When all the entities share the same shape, declare the shape once in an EntityTemplate.
+The template compiles to an EntityBuilder that emits the JSON entity directly from a precomputed skeleton.
+Neither the NGSI type of the values nor the JSON structure is inferred at each call.
+
+tpl = EntityTemplate("Room")
+tpl.add("temperature", "Number", metadata={"unitCode": {"value": "CEL"}})
+tpl.add("dateObserved", "DateTime")
+build = tpl.compile()
+msg = build("Room1", 21.7, datetime.utcnow())
+msg = build("Room1", temperature=21.7, dateObserved=datetime.utcnow())
+"""
+
+import operator
+
+from datetime import datetime
+from json.encoder import encode_basestring
+from geojson import Point
+from typing import Any, Callable, List, Tuple
+
+from pyngsi.ngsi import BaseDataModel, NgsiError, escape
+from pyngsi.utils.jsonbackend import dumps_json
+
+GEOJSON_PRECISION = 6  # same rounding as geojson
+
+
+def _float(v: float) -> str:
+    if v != v:
+        return "NaN"
+    if v in (float("inf"), float("-inf")):
+        return "Infinity" if v > 0 else "-Infinity"
+    return float.__repr__(v)
+
+
+def _number(v) -> str:
+    if isinstance(v, float):
+        return _float(v)
+    return int.__repr__(operator.index(v))
+
+
+def _boolean(v) -> str:
+    return "true" if v else "false"
+
+
+def _datetime(v) -> str:
+    if isinstance(v, datetime):
+        # the value datetime MUST be UTC
+        v = v.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return encode_basestring(v)
+
+
+def _urlencoded(v: str) -> str:
+    return encode_basestring(escape(v))
+
+
+def _coordinate(c) -> str:
+    return _float(round(c, GEOJSON_PRECISION)) if isinstance(c, float) else _number(c)
+
+
+def _location(v) -> str:
+    if isinstance(v, Point):
+        return dumps_json(v)
+    lat, lon = v
+    return f'{{"type": "Point", "coordinates": [{_coordinate(lon)}, {_coordinate(lat)}]}}'
+
+
+_ENCODERS = {
+    "Text": encode_basestring,
+    "URL": encode_basestring,
+    "Relationship": encode_basestring,
+    "STRING_URL_ENCODED": _urlencoded,
+    "Number": _number,
+    "Boolean": _boolean,
+    "DateTime": _datetime,
+    "geo:json": _location,
+}
+
+
+class EntityTemplate:
+    """
+    An EntityTemplate declares the attributes (name, NGSI type, metadata) shared by entities of a given type.
+
+    Supported NGSI types are those of the DataModel.
+    Values of types without a dedicated encoder (i.e. Array, Property, PostalAddress) are serialized as JSON.
+    """
+
+    def __init__(self, type: str, strict: bool = False, serializer: Callable = str):
+        self.type = type
+        self.strict = strict
+        self.serializer = serializer
+        self.attributes: List[Tuple[str, str, dict]] = []
+
+    def add(self, name: str, ngsi_type: str, metadata: dict = None):
+        """Declare an attribute
+
+        Args:
+            name (str): the attribute name
+            ngsi_type (str): the NGSI type, i.e. Text, Number, DateTime, geo:json
+            metadata (dict): the metadata shared by all entities. Defaults to no metadata.
+
+        Raises:
+            NgsiError
+        """
+        if self.strict:
+            BaseDataModel.enforce_id_restrictions(name)
+        if name in self.names:
+            raise NgsiError(f"Attribute {name} already declared")
+        self.attributes.append((name, ngsi_type, metadata))
+        return self
+
+    def add_relationship(self, rel_name: str):
+        if self.strict and not rel_name.startswith("ref"):
+            raise NgsiError(
+                f"Bad relationship name : {rel_name}. Relationship attributes must use prefix 'ref'")
+        return self.add(rel_name, "Relationship")
+
+    @property
+    def names(self) -> List[str]:
+        return [name for name, _, _ in self.attributes]
+
+    def compile(self):
+        return EntityBuilder(self)
+
+
+class EntityBuilder:
+    """
+    An EntityBuilder emits JSON entities that conform to an EntityTemplate.
+
+    Call the builder with the entity id followed by the attribute values, either in declaration order or by name.
+    The resulting JSON is the same as the one of the equivalent DataModel with the default JSON backend.
+    """
+
+    def __init__(self, template: EntityTemplate):
+        self.type = template.type
+        self.names = template.names
+        self.encoders = []
+        # fixed JSON parts, surrounding the id and the attribute values
+        parts = ['{"id": ', f', "type": {encode_basestring(template.type)}']
+        for name, t, metadata in template.attributes:
+            encoder = _ENCODERS.get(t)
+            if encoder is None:
+                def encoder(v, serializer=template.serializer):
+                    return dumps_json(v, serializer)
+            self.encoders.append(encoder)
+            parts[-1] += f', {encode_basestring(name)}: {{"value": '
+            suffix = f', "type": {encode_basestring(t)}'
+            if metadata:
+                suffix += f', "metadata": {dumps_json(metadata, template.serializer)}'
+            parts.append(suffix + "}")
+        parts[-1] += "}"
+        self.types = [t for _, t, _ in template.attributes]
+        # the JSON entity with a %s placeholder for the id and each value
+        self.skeleton = "%s".join(p.replace("%", "%%") for p in parts)
+
+    def __call__(self, id: str, *values: Any, **kwvalues: Any) -> str:
+        if kwvalues:
+            try:
+                values = [kwvalues[name] for name in self.names]
+            except KeyError as e:
+                raise NgsiError(f"Missing value for attribute {e}")
+        elif len(values) != len(self.encoders):
+            raise NgsiError(
+                f"Expected {len(self.encoders)} values, got {len(values)}")
+        try:
+            return self.skeleton % (encode_basestring(id), *[enc(v) for enc, v in zip(self.encoders, values)])
+        except Exception as e:
+            raise NgsiError(f"Cannot build entity {id} : {e}")
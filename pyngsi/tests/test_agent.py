@@ -1,10 +1,12 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from pyngsi.sources.source import Row
+import time
+
+from pyngsi.sources.source import Row, Source, SourceStream
 from pyngsi.sources.more_sources import SourceSampleOrion
-from pyngsi.sink import SinkNull, SinkStdout
-from pyngsi.agent import NgsiAgent, build_entity_unknown, build_entity_sample_orion
+from pyngsi.sink import Sink, SinkNull, SinkStdout
+from pyngsi.agent import NgsiAgent, NgsiAgentParallel, NgsiAgentPipelined, build_entity_unknown, build_entity_sample_orion
 from pyngsi.ngsi import DataModel
 
 
@@ -67,3 +69,115 @@ def test_agent_with_side_effect(mocker):
     agent.close()
     assert sink.write.call_count == 10  # pylint: disable=no-member
     assert agent.stats == agent.Stats(5, 5, 5, 0, 0, 5)
+
+
+class SinkList(Sink):
+    def __init__(self):
+        self.records = []
+
+    def write(self, msg):
+        self.records.append(msg)
+
+
+def build_entity_odd(row: Row) -> DataModel:
+    i = int(row.record)
+    if i % 2 == 0:
+        return None
+    m = DataModel(id=f"Room{i}", type="Room")
+    m.add("index", i)
+    return m
+
+
+def test_agent_parallel_ordered():
+    sink = SinkList()
+    src = SourceStream([str(i) for i in range(100)])
+    agent = NgsiAgentParallel(
+        src, sink, build_entity_odd, processes=2, chunksize=7)
+    agent.run()
+    agent.close()
+    assert sink.records == [build_entity_odd(
+        Row(record=str(i))).json() for i in range(1, 100, 2)]
+    assert agent.stats == agent.Stats(100, 50, 50, 50, 0)
+
+
+def test_agent_parallel_unordered_side_effect():
+    def side_effect(row, sink, entity):
+        sink.write(f"side-{entity['id']}")
+        return 1
+
+    sink = SinkList()
+    src = SourceStream([str(i) for i in range(20)])
+    agent = NgsiAgentParallel(src, sink, build_entity_odd, side_effect,
+                              processes=2, chunksize=3, ordered=False)
+    agent.run()
+    assert len(sink.records) == 20
+    assert "side-Room19" in sink.records
+    assert agent.stats == agent.Stats(20, 10, 10, 10, 0, 10)
+
+
+def test_stats_add():
+    stats = NgsiAgent.Stats(5, 5, 4, 0, 1, retries=2, breaker_open_time=1.5)
+    stats += NgsiAgent.Stats(1, 1, 1, retries=1)
+    assert stats == NgsiAgent.Stats(6, 6, 5, 0, 1, retries=3, breaker_open_time=1.5)
+    assert stats + stats == NgsiAgent.Stats(12, 12, 10, 0, 2, retries=6, breaker_open_time=3.0)
+    assert stats.zero() == NgsiAgent.Stats()
+
+
+class SinkSlow(SinkList):
+    def write(self, msg):
+        time.sleep(0.001)
+        super().write(msg)
+
+
+def test_agent_pipelined():
+    src = Source([Row("test", str(i)) for i in range(100)])
+    sink = SinkList()
+    agent = NgsiAgentPipelined(src, sink, process=build_entity_odd,
+                               side_effect=lambda row, sink, x: 1, queue_size=4)
+    agent.run()
+    agent.close()
+    assert sink.records == [build_entity_odd(Row("test", str(i))).json()
+                            for i in range(1, 100, 2)]
+    stats, queues = agent.status
+    assert stats == agent.Stats(100, 50, 50, 50, 0, 50)
+    assert queues["read"]["depth"] == queues["process"]["depth"] == 0
+
+
+def test_agent_pipelined_drop_oldest():
+    src = Source([Row("test", str(i)) for i in range(200)])
+    sink = SinkSlow()
+    agent = NgsiAgentPipelined(src, sink, queue_size=2, policy="drop-oldest")
+    agent.run()
+    _, queues = agent.status
+    assert queues["read"]["dropped"] > 0
+    assert len(sink.records) == 200 - queues["read"]["dropped"]
+    assert sink.records == sorted(sink.records, key=int)
+
+
+def test_agent_pipelined_spill(tmp_path):
+    src = Source([Row("test", str(i)) for i in range(200)])
+    sink = SinkSlow()
+    agent = NgsiAgentPipelined(src, sink, queue_size=2,
+                               policy="spill", spill_dir=tmp_path)
+    agent.run()
+    _, queues = agent.status
+    assert queues["read"]["spilled"] > 0
+    assert sink.records == [str(i) for i in range(200)]
+
+
+def test_agent_profiling():
+    src = SourceSampleOrion(count=5, delay=0)
+    sink = SinkList()
+    agent = NgsiAgent.create_agent(
+        src, sink, process=build_entity_sample_orion, side_effect=lambda row, sink, x: 0)
+    agent.set_profiling()
+    agent.run()
+    agent.close()
+    stats, latency = agent.status
+    assert stats == agent.Stats(5, 5, 5, 0, 0)
+    assert latency["source_next"]["count"] == 5
+    assert latency["process"]["count"] == latency["serialize"]["count"] == 5
+    assert latency["sink_write"]["count"] == latency["side_effect"]["count"] == 5
+    agent.set_profiling(False)
+    assert agent.latency is None
+    assert agent.status == stats
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import socket
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+
+from pyngsi.sources.source import Row
+from pyngsi.sources.more_sources import SourceSampleOrion
+from pyngsi.sink import SinkNull, SinkHttp, SinkException
+from pyngsi.sink_async import AsyncSink, AsyncSinkHttp
+from pyngsi.agent import NgsiAgent, build_entity_sample_orion
+from pyngsi.agent_async import NgsiAgentAsync
+
+
+class AsyncSinkRecorder(AsyncSink):
+    def __init__(self):
+        self.records = []
+
+    async def write(self, msg):
+        await asyncio.sleep(0)
+        self.records.append(msg)
+
+
+@pytest.fixture
+def unused_tcp_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_agent_async_sync_adapters(mocker):
+    src = SourceSampleOrion(count=5, delay=0)
+    sink = SinkNull()
+    mocker.spy(sink, "write")
+
+    async def main():
+        agent = NgsiAgentAsync(src, sink, process=build_entity_sample_orion)
+        await agent.run()
+        await agent.close()
+        return agent
+
+    agent = asyncio.run(main())
+    assert sink.write.call_count == 5  # pylint: disable=no-member
+    assert agent.stats == NgsiAgent.Stats(5, 5, 5, 0, 0)
+
+
+def test_agent_async_coroutines():
+    async def source():
+        for i in range(10):
+            yield Row("async", i)
+
+    async def process(row: Row):
+        await asyncio.sleep(0)
+        return None if row.record % 2 else str(row.record)
+
+    async def side_effect(row, sink, entity):
+        await sink.write(f"side-{entity}")
+        return 1
+
+    sink = AsyncSinkRecorder()
+
+    async def main():
+        agent = NgsiAgentAsync(source(), sink, process, side_effect, concurrency=3)
+        await agent.run()
+        return agent
+
+    agent = asyncio.run(main())
+    assert agent.stats == NgsiAgent.Stats(10, 5, 5, 5, 0, 5)
+    assert sorted(sink.records) == sorted(
+        ["0", "2", "4", "6", "8", "side-0", "side-2", "side-4", "side-6", "side-8"])
+
+
+def test_async_sink_http(unused_tcp_port):
+    received = []
+
+    async def handler(request):
+        received.append(await request.text())
+        if "error" in received[-1]:
+            return web.Response(status=400, text="bad entity")
+        return web.Response(status=201)
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/v2/entities", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", unused_tcp_port).start()
+        sink = AsyncSinkHttp(
+            SinkHttp(port=unused_tcp_port, post_endpoint="/v2/entities"))
+        try:
+            await asyncio.gather(*[sink.write(f'{{"id": "Room{i}"}}') for i in range(5)])
+            with pytest.raises(SinkException):
+                await sink.write("error")
+        finally:
+            await sink.close()
+            await runner.cleanup()
+
+    asyncio.run(main())
+    assert len(received) == 6
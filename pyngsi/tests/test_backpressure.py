@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from pyngsi.utils.backpressure import BackpressureQueue, QueueClosed
+
+
+def drain(q: BackpressureQueue):
+    items = []
+    q.close()
+    try:
+        while True:
+            items.append(q.get())
+    except QueueClosed:
+        return items
+
+
+def test_queue_drop_oldest():
+    q = BackpressureQueue(3, "drop-oldest")
+    for i in range(5):
+        q.put(i)
+    assert q.gauges()["dropped"] == 2
+    assert drain(q) == [2, 3, 4]
+
+
+def test_queue_spill(tmp_path):
+    q = BackpressureQueue(2, "spill", spill_dir=tmp_path)
+    for i in range(5):
+        q.put(i)
+    assert len(q) == 5
+    assert q.gauges()["spilled"] == 3
+    assert q.get() == 0
+    q.put(5)  # still spilled to keep the order
+    assert drain(q) == [1, 2, 3, 4, 5]
+    assert q.gauges()["spill_pending"] == 0
+
+
+def test_queue_unknown_policy():
+    with pytest.raises(ValueError):
+        BackpressureQueue(2, "dummy")
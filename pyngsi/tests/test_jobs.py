@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+import threading
+
+from pyngsi.utils.jobs import JobQueue, JobQueueFull, DONE, FAILED
+
+
+def test_jobs_run():
+    jobs = JobQueue(workers=2)
+    ok = jobs.submit(lambda job: 42)
+    ko = jobs.submit(lambda job: 1 / 0)
+    jobs.close()
+    assert jobs.get(ok.id).state == DONE
+    assert ok.stats == 42
+    assert ko.state == FAILED
+    assert ko.error == "division by zero"
+    assert jobs.gauges()["done"] == 1
+    assert jobs.gauges()["failed"] == 1
+
+
+def test_jobs_queue_full():
+    started, release = threading.Event(), threading.Event()
+
+    def wait(job):
+        started.set()
+        release.wait()
+
+    jobs = JobQueue(workers=1, maxsize=1)
+    jobs.submit(wait)
+    started.wait()  # the worker is busy
+    jobs.submit(wait)  # waits in the queue
+    with pytest.raises(JobQueueFull):
+        jobs.submit(wait)
+    assert jobs.gauges()["rejected"] == 1
+    release.set()
+    jobs.close()
+    assert jobs.gauges()["done"] == 2
+
+
+def test_jobs_max_finished():
+    jobs = JobQueue(workers=1, max_finished=2)
+    ids = [jobs.submit(lambda job: None).id for _ in range(4)]
+    jobs.close()
+    assert [jobs.get(id) is not None for id in ids] == [
+        False, False, True, True]
@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from pyngsi.utils.latency import LatencyHistogram, StageLatency, STAGES
+
+
+def test_histogram_percentiles():
+    h = LatencyHistogram()
+    for i in range(1, 1001):
+        h.record(i / 1000)
+    assert h.count == 1000
+    assert h.percentile(50) == pytest.approx(0.5, rel=0.07)
+    assert h.percentile(99) == pytest.approx(0.99, rel=0.07)
+    assert h.percentile(100) == 1.0
+    d = h.to_dict()
+    assert d["mean"] == pytest.approx(500.5)
+    assert d["max"] == 1000.0
+
+
+def test_histogram_empty():
+    assert LatencyHistogram().to_dict() == {"count": 0, "mean": 0.0, "p50": 0.0,
+                                            "p95": 0.0, "p99": 0.0, "max": 0.0}
+
+
+def test_stage_latency():
+    latency = StageLatency()
+    latency.record("process", 0.001)
+    d = latency.to_dict()
+    assert list(d) == list(STAGES)
+    assert d["process"]["count"] == 1
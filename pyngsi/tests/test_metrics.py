@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+
+from pyngsi.agent import NgsiAgent
+from pyngsi.utils.latency import StageLatency
+from pyngsi.utils.metrics import Metrics, CachedStatus
+
+
+def test_metrics_stats():
+    metrics = Metrics()
+    metrics.add_stats(NgsiAgent.Stats(5, 4, 3, 1, 1))
+    text = metrics.text()
+    assert "# TYPE pyngsi_agent_input_total counter\npyngsi_agent_input_total 5\n" in text
+    assert "pyngsi_agent_error_total 1\n" in text
+
+
+def test_metrics_latency_and_remote_status():
+    latency = StageLatency()
+    latency.record("sink_write", 0.25)
+    metrics = Metrics()
+    metrics.add_latency(latency)
+    metrics.add_remote_status({"state": "Down or Unreachable"})
+    text = metrics.text()
+    assert text.count("# TYPE pyngsi_stage_latency_seconds summary") == 1
+    assert 'pyngsi_stage_latency_seconds{stage="sink_write",quantile="0.5"} 0.25\n' in text
+    assert 'pyngsi_stage_latency_seconds_count{stage="sink_write"} 1\n' in text
+    assert "pyngsi_remote_up 0\n" in text
+
+
+def test_cached_status():
+    calls = []
+
+    def status():
+        calls.append(1)
+        return {"version": len(calls)}
+
+    cached = CachedStatus(status, interval=0.05)
+    cached.get()
+    time.sleep(0.12)
+    assert cached.get()["version"] >= 2
+    cached.stop()
@@ -2,11 +2,12 @@
 # -*- coding: utf-8 -*-
 
 import pytest
+import json
 
 from datetime import datetime, timedelta, timezone
 from geojson import Point
 
-from pyngsi.ngsi import DataModel, NgsiError, NgsiRestrictionViolationError, unescape, ONE_WEEK
+from pyngsi.ngsi import DataModel, CompactDataModel, NgsiError, NgsiRestrictionViolationError, unescape, ONE_WEEK
 
 
 def test_create():
@@ -244,3 +245,55 @@ def test_strict_mode():
     m = DataModel("id", "type", strict=True)
     with pytest.raises(NgsiRestrictionViolationError):
         m.add("id", "Pixel")
+
+
+def test_json_backend_unknown():
+    with pytest.raises(NgsiError, match=r".*Unknown JSON backend.*"):
+        DataModel.set_json_backend("unknown")
+
+
+def test_json_backend_orjson():
+    pytest.importorskip("orjson")
+    m = DataModel("id", "type")
+    m.add("location", (44.8333, -0.5667))
+    m.add("dateObserved", datetime(2019, 6, 1, 18, 30, 0))
+    m.add("collection", [{"dateObserved": datetime(2019, 6, 1, 18, 30, 0)}])
+    m.add("name", "Bâtiment")
+    expected = json.loads(m.json())
+    DataModel.set_json_backend("orjson")
+    try:
+        assert json.loads(m.json()) == expected
+        assert "Bâtiment" in m.json()
+    finally:
+        DataModel.set_json_backend()
+
+
+def test_compact_same_json():
+    def build(m):
+        m.add("temperature", 37.2, metadata={"unitCode": {"value": "CEL"}})
+        m.add_date("dateObserved", "2018-01-01T15:00:00")
+        m.add_url("dataProvider", "https://www.fiware.org")
+        m.add("location", (44.8333, -0.5667))
+        m.add_relationship("refStore", "urn:ngsi-ld:Shelf", "001")
+        m.add_address({"addressLocality": "London"})
+        return m
+    m = build(CompactDataModel("id", "type"))
+    assert m.json() == build(DataModel("id", "type")).json()
+    assert m == build(DataModel("id", "type"))
+
+
+def test_compact_mapping():
+    m = CompactDataModel("id", "type")
+    m.add("temperature", 37)
+    assert m["id"] == "id"
+    assert m["type"] == "type"
+    assert m["temperature"] == {"value": 37, "type": "Number"}
+    assert "temperature" in m
+    assert list(m) == ["id", "type", "temperature"]
+    assert not hasattr(m, "__dict__")
+
+
+def test_compact_strict():
+    m = CompactDataModel("id", "type", strict=True)
+    with pytest.raises(NgsiRestrictionViolationError):
+        m.add("forbiddenCharacters", r"""BEGIN<>"'=;()END""")
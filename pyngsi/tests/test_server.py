@@ -2,11 +2,19 @@
 # -*- coding: utf-8 -*-
 
 import pytest
+import gzip
 import json
+import time
+import socket
+import threading
 
 from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 
-from pyngsi.sources.server import ServerHttpUpload
+from pyngsi.sources.source import Source, SourceStream
+from pyngsi.sources.server import ServerHttpUpload, ServerUdp, ServerTcp
+from pyngsi.agent import NgsiAgentServer
+from pyngsi.sink import Sink, SinkNull
 from pyngsi.__init__ import __version__ as version
 
 
@@ -39,3 +47,268 @@ def test_upload_multipart(client):
     response = client.post(
         "/upload", content_type="multipart/form-data", data=data)
     assert response.status_code == 200
+
+
+def test_upload_multipart_json(client):
+    data = dict(
+        file=(BytesIO(b'[{"room": "Room1"}, {"room": "Room2"}]'), "rooms.json")
+    )
+    response = client.post(
+        "/upload", content_type="multipart/form-data", data=data)
+    assert response.status_code == 200
+
+
+def test_upload_multipart_ndjson(client):
+    data = dict(
+        file=(BytesIO(b'{"room": "Room1"}\n{"room": "Room2"}\n'), "rooms.jsonl")
+    )
+    response = client.post(
+        "/upload", content_type="multipart/form-data", data=data)
+    assert response.status_code == 200
+
+
+@pytest.fixture
+def agent():
+    src = ServerHttpUpload()
+    agent = NgsiAgentServer(src, SinkNull())
+    src.set_agent(agent)
+    return agent
+
+
+def test_upload_raw_text_gzip(agent):
+    client = agent.server.app.test_client()
+    response = client.post("/upload", data=gzip.compress(b"Room1;23;710\r\nRoom2;21;711\n"),
+                           headers={"Content-Encoding": "gzip"})
+    data = json.loads(response.get_data(as_text=True))
+    assert data["statistics"]["input"] == 2
+    assert agent.stats.output == 2
+
+
+def test_upload_raw_json_array(agent):
+    client = agent.server.app.test_client()
+    response = client.post("/upload", json=[{"room": "Room1"}, {"room": "Room2"}])
+    data = json.loads(response.get_data(as_text=True))
+    assert data["statistics"]["input"] == 2
+
+
+def test_upload_raw_json_invalid(agent):
+    client = agent.server.app.test_client()
+    response = client.post("/upload", data="[{", content_type="application/json")
+    data = json.loads(response.get_data(as_text=True))
+    assert data["status"] == 400
+    assert agent.server_status.calls_error == 1
+
+
+def test_upload_multipart_csv_gzip(agent):
+    client = agent.server.app.test_client()
+    data = dict(
+        file=(BytesIO(gzip.compress(b"Room1;23;710\nRoom2;21;711\n")), "rooms.csv.gz")
+    )
+    response = client.post(
+        "/upload", content_type="multipart/form-data", data=data)
+    data = json.loads(response.get_data(as_text=True))
+    assert data["statistics"]["input"] == 2
+
+
+def test_metrics(agent):
+    client = agent.server.app.test_client()
+    client.post("/upload", json={"room": "Room1"})
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain")
+    text = response.get_data(as_text=True)
+    assert "pyngsi_calls_total 1\n" in text
+    assert "pyngsi_agent_output_total 1\n" in text
+
+
+def test_upload_async(tmp_path):
+    src = ServerHttpUpload().set_async(workers=1, upload_dir=str(tmp_path))
+    agent = NgsiAgentServer(src, SinkNull())
+    src.set_agent(agent)
+    client = src.app.test_client()
+    response = client.post("/upload", data=gzip.compress(b"Room1;23;710\nRoom2;21;711\n"),
+                           headers={"Content-Encoding": "gzip"})
+    assert response.status_code == 202
+    id = json.loads(response.get_data(as_text=True))["job"]
+    assert response.headers["Location"] == f"/jobs/{id}"
+    src.close()  # waits for the job
+    response = client.get(f"/jobs/{id}")
+    data = json.loads(response.get_data(as_text=True))
+    assert data["state"] == "done"
+    assert data["statistics"]["output"] == 2
+    assert agent.server_status.calls_success == 1
+    assert not list(tmp_path.iterdir())  # the upload is removed
+    assert client.get("/jobs/unknown").status_code == 404
+
+
+def test_upload_async_queue_full():
+    release = threading.Event()
+    src = ServerHttpUpload().set_async(workers=1, max_pending=1)
+    agent = NgsiAgentServer(src, SinkNull(), process=lambda row: release.wait() and row.record)
+    src.set_agent(agent)
+    client = src.app.test_client()
+    assert client.post("/upload", data="Room1").status_code == 202
+    while src.jobs.gauges()["running"] == 0:
+        time.sleep(0.01)
+    assert client.post("/upload", data="Room2").status_code == 202
+    response = client.post("/upload", data="Room3")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    release.set()
+    src.close()
+    assert agent.stats.output == 2
+    assert agent.server_status.calls_error == 1
+
+
+def test_upload_concurrent_shared_sink():
+
+    class SinkCount(Sink):
+        def __init__(self):
+            self.count = 0
+            self.closed = False
+            self.lock = threading.Lock()
+
+        def write(self, msg):
+            assert not self.closed
+            with self.lock:
+                self.count += 1
+
+        def close(self):
+            self.closed = True
+
+    sink = SinkCount()
+    src = ServerHttpUpload()
+    agent = NgsiAgentServer(src, sink)
+    src.set_agent(agent)
+    body = "".join(f"Room{i};23;710\n" for i in range(100))
+
+    def upload(_):
+        return src.app.test_client().post("/upload", data=body).status_code
+
+    with ThreadPoolExecutor(8) as executor:
+        assert set(executor.map(upload, range(40))) == {200}
+    assert not sink.closed  # the sink outlives the requests
+    assert sink.count == 4000
+    assert agent.stats.input == agent.stats.output == 4000
+    assert agent.server_status.calls == agent.server_status.calls_success == 40
+
+
+def run_udp(src: ServerUdp, agent: NgsiAgentServer, datagrams: list, expected: int):
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    for datagram in datagrams:
+        client.sendto(datagram, src.s.getsockname())
+    thread = threading.Thread(target=src.run)
+    thread.start()
+    deadline = time.time() + 5
+    while agent.server_status.calls < expected and time.time() < deadline:
+        time.sleep(0.01)
+    src.interrupted = True
+    thread.join()
+    src.close()
+
+
+def test_server_udp_batches():
+    src = ServerUdp(port=0, bufsize=32, batch_size=16, rcvbuf=1 << 20)
+    agent = NgsiAgentServer(src, SinkNull())
+    src.set_agent(agent)
+    datagrams = [f"!AIVDM,1,1,,A,{i}".encode() for i in range(100)]
+    run_udp(src, agent, datagrams + [b"x" * 64], 101)  # the last one is larger than bufsize
+    assert agent.stats.output == 101
+    assert agent.server_status.calls_success == 101
+    assert src.status() == {"datagrams": 101, "dropped": 0, "truncated": 1}
+    assert agent.status[2] == src.status()
+
+
+def test_server_udp_ignore_header():
+    src = ServerUdp(port=0, batch_size=2, ignore_header=True)
+    agent = NgsiAgentServer(src, SinkNull())
+    src.set_agent(agent)
+    run_udp(src, agent, [b"header", b"frame1", b"frame2", b"frame3"], 4)
+    assert agent.stats.output == 3  # only the first datagram is skipped
+
+
+def start_tcp(src: ServerTcp) -> threading.Thread:
+    thread = threading.Thread(target=src.run)
+    thread.start()
+    return thread
+
+
+def stop_tcp(src: ServerTcp, agent: NgsiAgentServer, thread: threading.Thread, expected: int):
+    deadline = time.time() + 5
+    while agent.server_status.calls_success < expected and time.time() < deadline:
+        time.sleep(0.01)
+    src.interrupted = True
+    thread.join()
+    src.close()
+
+
+def test_server_tcp_clients():
+    providers = []
+    src = ServerTcp(port=0, bufsize=16)
+    agent = NgsiAgentServer(src, SinkNull(),
+                            process=lambda row: providers.append(row.provider) or row.record)
+    src.set_agent(agent)
+    thread = start_tcp(src)
+    clients = [socket.create_connection(src.s.getsockname()) for _ in range(3)]
+    for i, client in enumerate(clients):
+        client.sendall(f"$GPGGA,{i},1\r\n$GPGGA,{i},2\n$GPG".encode())
+    for client in clients:
+        client.sendall(b"GA,last")  # completed on disconnection
+        client.close()
+    stop_tcp(src, agent, thread, 9)
+    assert agent.stats.output == 9
+    assert len(set(providers)) == 3
+    assert all(p.startswith("TCP Server@127.0.0.1:") for p in providers)
+    assert src.status()["connections"] == 3
+    assert src.status()["active"] == 0
+    assert agent.status[2] == src.status()
+
+
+def test_server_tcp_ignore_header():
+    records = []
+    src = ServerTcp(port=0, ignore_header=True)
+    agent = NgsiAgentServer(src, SinkNull(), process=lambda row: records.append(row.record) or row.record)
+    src.set_agent(agent)
+    thread = start_tcp(src)
+    for _ in range(2):
+        with socket.create_connection(src.s.getsockname()) as client:
+            client.sendall(b"id;temperature\nRoom1;23\n")
+    stop_tcp(src, agent, thread, 2)
+    assert records == ["Room1;23", "Room1;23"]
+
+
+def test_server_tcp_backpressure():
+    release = threading.Event()
+    src = ServerTcp(port=0, bufsize=8, max_pending=1)
+    agent = NgsiAgentServer(src, SinkNull(), process=lambda row: release.wait() and row.record)
+    src.set_agent(agent)
+    thread = start_tcp(src)
+    with socket.create_connection(src.s.getsockname()) as client:
+        for i in range(20):
+            client.sendall(f"Room{i}\n".encode())
+            time.sleep(0.001)
+    deadline = time.time() + 5
+    while not src.stalls and time.time() < deadline:
+        time.sleep(0.01)
+    assert src.stalls  # the server stopped reading
+    release.set()
+    stop_tcp(src, agent, thread, 20)
+    assert agent.stats.output == 20
+
+
+def test_upload_async_registered_extension(tmp_path):
+    Source.register_extension("rooms", lambda filename: SourceStream(open(filename)))
+    try:
+        src = ServerHttpUpload().set_async(workers=1, upload_dir=str(tmp_path))
+        agent = NgsiAgentServer(src, SinkNull())
+        src.set_agent(agent)
+        client = src.app.test_client()
+        for body in (b"Room1\n", b"Room2\nRoom3\n"):  # same filename : no overwrite
+            data = dict(file=(BytesIO(body), "data.rooms"))
+            response = client.post("/upload", content_type="multipart/form-data", data=data)
+            assert response.status_code == 202
+        src.close()
+        assert agent.stats.output == 3
+        assert not list(tmp_path.iterdir())
+    finally:
+        Source.unregister_extension("rooms")
@@ -3,13 +3,18 @@
 import pytest
 import os
 import gzip
+import json
+import time
+import zlib
 import pkg_resources
 
 from os.path import join
 from loguru import logger
 
-from pyngsi.sink import SinkNull, SinkStdout, SinkFile, SinkFileGzipped,\
-    SinkHttp, SinkOrion, SinkException
+from pyngsi.sink import Sink, SinkNull, SinkStdout, SinkFile, SinkFileGzipped,\
+    SinkHttp, SinkOrion, SinkOrionBatch, SinkConcurrent, SinkCoalesce, SinkSkipUnchanged, SinkSpool, SinkException, SinkCircuitOpenException,\
+    RetryPolicy, CircuitBreaker, entity_key
+from pyngsi.agent import NgsiAgent
 
 
 def test_sink_null(mocker):
@@ -74,6 +79,96 @@ def test_sink_http_error(requests_mock):
         sink.write(msg="dummy")
 
 
+def test_sink_http_retry(requests_mock):
+    sink = SinkHttp(retry=RetryPolicy(max_attempts=3, backoff=0.001))
+    stats = NgsiAgent.Stats()
+    sink.bind(stats)
+    requests_mock.post("http://127.0.0.1:8080/",
+                       [{"status_code": 503}, {"status_code": 503}, {"status_code": 201}])
+    sink.write(msg="dummy")
+    assert requests_mock.call_count == 3
+    assert stats.retries == 2
+
+
+def test_sink_http_retry_exhausted(requests_mock):
+    sink = SinkHttp(retry=RetryPolicy(max_attempts=2, backoff=0.001))
+    requests_mock.post("http://127.0.0.1:8080/", status_code=503)
+    with pytest.raises(SinkException):
+        sink.write(msg="dummy")
+    assert requests_mock.call_count == 2
+
+
+def test_sink_http_no_retry_client_error(requests_mock):
+    sink = SinkHttp(retry=RetryPolicy(max_attempts=3, backoff=0.001))
+    requests_mock.post("http://127.0.0.1:8080/", status_code=400)
+    with pytest.raises(SinkException):
+        sink.write(msg="dummy")
+    assert requests_mock.call_count == 1
+
+
+def test_sink_http_circuit_breaker(requests_mock):
+    sink = SinkHttp(breaker=CircuitBreaker(
+        failure_threshold=2, reset_timeout=0.05))
+    stats = NgsiAgent.Stats()
+    sink.bind(stats)
+    requests_mock.post("http://127.0.0.1:8080/", status_code=503)
+    for _ in range(2):
+        with pytest.raises(SinkException):
+            sink.write(msg="dummy")
+    assert sink.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(SinkCircuitOpenException):  # fail fast
+        sink.write(msg="dummy")
+    assert requests_mock.call_count == 2
+    time.sleep(0.05)
+    with pytest.raises(SinkException):  # failed probe
+        sink.write(msg="dummy")
+    assert sink.breaker.state == CircuitBreaker.OPEN
+    time.sleep(0.05)
+    requests_mock.post("http://127.0.0.1:8080/", status_code=201)
+    sink.write(msg="dummy")  # successful probe
+    assert sink.breaker.state == CircuitBreaker.CLOSED
+    assert requests_mock.call_count == 4
+    assert stats.breaker_trips == 1
+    assert stats.breaker_open_time >= 0.1
+
+
+def test_sink_http_gzip(requests_mock):
+    sink = SinkHttp()
+    sink.set_compression("gzip", threshold=100)
+    requests_mock.post("http://127.0.0.1:8080/")
+    msg = json.dumps([{"id": f"Room{i}", "type": "Room"} for i in range(20)])
+    sink.write(msg)
+    request = requests_mock.last_request
+    assert request.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(request.body).decode("utf-8") == msg
+    assert sink.bytes_raw == len(msg)
+    assert sink.bytes_sent == len(request.body) < len(msg)
+
+
+def test_sink_http_deflate_threshold(requests_mock):
+    sink = SinkHttp()
+    sink.set_compression("deflate", threshold=100)
+    requests_mock.post("http://127.0.0.1:8080/")
+    sink.write("dummy")
+    assert "Content-Encoding" not in requests_mock.last_request.headers
+    sink.write("dummy" * 100)
+    assert requests_mock.last_request.headers["Content-Encoding"] == "deflate"
+    assert zlib.decompress(requests_mock.last_request.body) == b"dummy" * 100
+    with pytest.raises(SinkException):
+        sink.set_compression("brotli")
+
+
+def test_sink_http_pool(requests_mock):
+    sink = SinkHttp()
+    sink.set_pool(pool_maxsize=4, keep_alive=False, tcp_keepalive=30)
+    requests_mock.post("http://127.0.0.1:8080/")
+    sink.write("dummy")
+    assert requests_mock.last_request.headers["Connection"] == "close"
+    adapter = sink.session.get_adapter("http://127.0.0.1:8080/")
+    assert adapter._pool_maxsize == 4
+    assert adapter.tcp_keepalive == 30
+
+
 def test_sink_http_server_status(requests_mock):
     sink = SinkHttp()
     requests_mock.get("http://127.0.0.1:8080/status",
@@ -211,3 +306,302 @@ def test_sink_orion_create_from_yaml_config_file_not_found():
         __name__, "data/orion-not-found.yml")
     with pytest.raises(SinkException, match=r".*Cannot read config.*"):
         sink = SinkOrion.from_config(filename)
+
+
+def test_sink_orion_batch_count(requests_mock):
+    sink = SinkOrionBatch(batch_size=2, max_latency=None)
+    requests_mock.post("http://127.0.0.1:1026/v2/op/update", status_code=204)
+    sink.write(r'{"id": "Room1", "type": "Room"}')
+    assert requests_mock.call_count == 0
+    sink.write(r'{"id": "Room2", "type": "Room"}')
+    assert requests_mock.call_count == 1
+    payload = json.loads(requests_mock.last_request.body)
+    assert payload["actionType"] == "append"
+    assert [e["id"] for e in payload["entities"]] == ["Room1", "Room2"]
+
+
+def test_sink_orion_batch_bytes(requests_mock):
+    sink = SinkOrionBatch(batch_size=100, max_bytes=80, max_latency=None)
+    requests_mock.post("http://127.0.0.1:1026/v2/op/update", status_code=204)
+    sink.write(r'{"id": "Room1", "type": "Room"}')
+    sink.write(r'{"id": "Room2", "type": "Room"}')
+    assert requests_mock.call_count == 1
+    assert len(json.loads(requests_mock.last_request.body)["entities"]) == 1
+    sink.close()
+    assert requests_mock.call_count == 2
+
+
+def test_sink_orion_batch_latency(requests_mock):
+    sink = SinkOrionBatch(batch_size=100, max_latency=0.05)
+    requests_mock.post("http://127.0.0.1:1026/v2/op/update", status_code=204)
+    sink.write(r'{"id": "Room1", "type": "Room"}')
+    time.sleep(0.3)
+    assert requests_mock.call_count == 1
+
+
+def test_sink_orion_batch_close(requests_mock):
+    sink = SinkOrionBatch(batch_size=100, max_latency=None)
+    requests_mock.post("http://127.0.0.1:1026/v2/op/update", status_code=204)
+    sink.write(r'{"id": "Room1", "type": "Room"}')
+    sink.close()
+    assert requests_mock.call_count == 1
+
+
+def test_sink_orion_batch_error_attribution(requests_mock):
+    sink = SinkOrionBatch(batch_size=100, max_latency=None)
+    stats = NgsiAgent.Stats(3, 3, 3, 0, 0)
+    sink.bind(stats)
+    requests_mock.post("http://127.0.0.1:1026/v2/op/update", status_code=400)
+    requests_mock.post("http://127.0.0.1:1026/v2/entities?options=upsert",
+                       additional_matcher=lambda request: b"Room2" not in request.body)
+    requests_mock.post("http://127.0.0.1:1026/v2/entities?options=upsert",
+                       additional_matcher=lambda request: b"Room2" in request.body, status_code=400)
+    for i in range(3):
+        sink.write(f'{{"id": "Room{i+1}", "type": "Room"}}')
+    sink.flush()
+    assert stats == NgsiAgent.Stats(3, 3, 2, 0, 1)
+
+
+def test_sink_orion_batch_server_error(requests_mock):
+    sink = SinkOrionBatch(batch_size=100, max_latency=None)
+    stats = NgsiAgent.Stats(2, 2, 2, 0, 0)
+    sink.bind(stats)
+    requests_mock.post("http://127.0.0.1:1026/v2/op/update", status_code=503)
+    sink.write(r'{"id": "Room1", "type": "Room"}')
+    sink.write(r'{"id": "Room2", "type": "Room"}')
+    sink.flush()
+    assert stats == NgsiAgent.Stats(2, 2, 0, 0, 2)
+
+
+class SinkRecorder(Sink):
+    def __init__(self, delay: float = 0, fail: str = None):
+        self.delay = delay
+        self.fail = fail
+        self.records = []
+
+    def write(self, msg):
+        time.sleep(self.delay)
+        if self.fail and self.fail in msg:
+            raise SinkException("failed")
+        self.records.append(msg)
+
+
+def test_entity_key():
+    assert entity_key(r'{"id": "Room1", "type": "Room"}') == ("Room1", "Room")
+    assert entity_key({"id": "Room1", "type": "Room"}) == ("Room1", "Room")
+    assert entity_key("dummy") == "dummy"
+
+
+def test_sink_concurrent_order_by_entity():
+    recorder = SinkRecorder(delay=0.001)
+    sink = SinkConcurrent(recorder, workers=4, queue_size=2)
+    msgs = [f'{{"id": "Room{i % 3}", "type": "Room", "seq": {i}}}' for i in range(30)]
+    for msg in msgs:
+        sink.write(msg)
+    sink.close()
+    assert sorted(recorder.records) == sorted(msgs)
+    for room in range(3):
+        seqs = [json.loads(r)["seq"]
+                for r in recorder.records if f'"Room{room}"' in r]
+        assert seqs == sorted(seqs)
+
+
+def test_sink_concurrent_dict_without_id():
+    recorder = SinkRecorder()
+    sink = SinkConcurrent(recorder, workers=2)
+    sink.write({"temperature": 21.5})  # no entity key
+    sink.close()
+    assert len(recorder.records) == 1
+
+
+def test_sink_concurrent_error_attribution():
+    sink = SinkConcurrent(SinkRecorder(fail="Room2"), workers=2)
+    stats = NgsiAgent.Stats(3, 3, 3, 0, 0)
+    sink.bind(stats)
+    for i in range(3):
+        sink.write(f'{{"id": "Room{i+1}", "type": "Room"}}')
+    sink.flush()
+    assert stats == NgsiAgent.Stats(3, 3, 2, 0, 1)
+    sink.close()
+
+
+def test_sink_concurrent_orion(requests_mock):
+    sink = SinkConcurrent(SinkOrion(), workers=2)
+    requests_mock.post("http://127.0.0.1:1026/v2/entities?options=upsert")
+    for i in range(10):
+        sink.write(f'{{"id": "Room{i+1}", "type": "Room"}}')
+    sink.close()
+    assert requests_mock.call_count == 10
+
+
+class SinkFlaky(SinkRecorder):
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def write(self, msg):
+        if self.failures:
+            self.failures -= 1
+            raise SinkException("down")
+        super().write(msg)
+
+
+def test_sink_spool(tmp_path):
+    recorder = SinkRecorder()
+    sink = SinkSpool(recorder, directory=tmp_path, fsync_interval=0.01)
+    msgs = [f'{{"id": "Room{i}", "type": "Room"}}' for i in range(20)]
+    for msg in msgs:
+        sink.write(msg)
+    sink.flush()
+    assert recorder.records == msgs
+    assert sink.status()["spool"]["pending"] == 0
+    sink.close()
+
+
+def test_sink_spool_retry(tmp_path):
+    recorder = SinkFlaky(failures=3)
+    sink = SinkSpool(recorder, directory=tmp_path,
+                     fsync_interval=0.01, retry_delay=0.01)
+    msgs = [f'{{"id": "Room{i}", "type": "Room"}}' for i in range(5)]
+    for msg in msgs:
+        sink.write(msg)
+    time.sleep(0.2)
+    sink.flush()
+    assert recorder.records == msgs
+    sink.close()
+
+
+def test_sink_spool_drain_failure(tmp_path):
+    def failure(*args):
+        raise OSError("disk failure")
+
+    sink = SinkSpool(SinkRecorder(), directory=tmp_path, fsync_interval=0.01)
+    sink._records = failure
+    sink.write('{"id": "Room1", "type": "Room"}')
+    with pytest.raises(SinkException, match="disk failure"):  # flush() does not wait forever
+        sink.flush()
+    with pytest.raises(SinkException):
+        sink.close()
+
+
+def test_sink_spool_replay(tmp_path):
+    down = SinkRecorder(fail="Room")
+    sink = SinkSpool(down, directory=tmp_path, segment_size=100,
+                     fsync_interval=0.01, retry_delay=10)
+    msgs = [f'{{"id": "Room{i}", "type": "Room"}}' for i in range(10)]
+    for msg in msgs:
+        sink.write(msg)
+    time.sleep(0.1)
+    status = sink.status()["spool"]
+    assert status["pending"] == 10
+    assert status["segments"] > 1
+    assert status["retrying"]
+    sink.close()
+    recorder = SinkRecorder()
+    sink = SinkSpool(recorder, directory=tmp_path)
+    sink.close()
+    assert recorder.records == msgs
+    assert sink.status()["spool"] == {"pending": 0, "segments": 1, "bytes": 0,
+                                      "lag": 0.0, "retrying": False}
+
+
+def test_sink_spool_max_retries(tmp_path):
+    stats = NgsiAgent.Stats(output=2)
+    recorder = SinkRecorder(fail="Room1")
+    sink = SinkSpool(recorder, directory=tmp_path,
+                     retry_delay=0.001, max_retries=2)
+    sink.bind(stats)
+    sink.write('{"id": "Room1", "type": "Room"}')
+    sink.write('{"id": "Room2", "type": "Room"}')
+    sink.flush()
+    time.sleep(0.1)
+    sink.close()
+    assert recorder.records == ['{"id": "Room2", "type": "Room"}']
+    assert stats.output == 1
+    assert stats.error == 1
+
+
+def test_sink_coalesce_latest():
+    recorder = SinkRecorder()
+    sink = SinkCoalesce(recorder, max_latency=None)
+    for i in range(30):
+        sink.write(f'{{"id": "Room{i % 3}", "type": "Room", "seq": {i}}}')
+    assert recorder.records == []
+    sink.flush()
+    assert recorder.records == ['{"id": "Room0", "type": "Room", "seq": 27}',
+                                '{"id": "Room1", "type": "Room", "seq": 28}',
+                                '{"id": "Room2", "type": "Room", "seq": 29}']
+    assert (sink.received, sink.written) == (30, 3)
+
+
+def test_sink_coalesce_merge():
+    recorder = SinkRecorder()
+    sink = SinkCoalesce(recorder, max_latency=None, merge=True)
+    sink.write('{"id": "Room1", "type": "Room", "temperature": {"value": 21, "type": "Number"}}')
+    sink.write({"id": "Room1", "type": "Room",
+                "pressure": {"value": 720, "type": "Number"}})
+    sink.write('{"id": "Room1", "type": "Room", "temperature": {"value": 22, "type": "Number"}}')
+    sink.close()
+    assert [json.loads(r) for r in recorder.records] == [{"id": "Room1", "type": "Room",
+                                                         "temperature": {"value": 22, "type": "Number"},
+                                                         "pressure": {"value": 720, "type": "Number"}}]
+
+
+def test_sink_coalesce_window():
+    recorder = SinkRecorder()
+    sink = SinkCoalesce(recorder, max_latency=0.05, max_entities=2)
+    sink.write('{"id": "Room1", "type": "Room"}')
+    sink.write('{"id": "Room2", "type": "Room"}')  # window is full
+    assert len(recorder.records) == 2
+    sink.write('{"id": "Room3", "type": "Room"}')
+    time.sleep(0.2)  # window has elapsed
+    assert len(recorder.records) == 3
+
+
+def test_sink_coalesce_error_attribution():
+    stats = NgsiAgent.Stats(3, 3, 3, 0, 0)
+    sink = SinkCoalesce(SinkRecorder(fail="Room2"), max_latency=None)
+    sink.bind(stats)
+    sink.write('{"id": "Room1", "type": "Room"}')
+    sink.write('{"id": "Room2", "type": "Room", "seq": 1}')
+    sink.write('{"id": "Room2", "type": "Room", "seq": 2}')
+    sink.flush()
+    assert stats == NgsiAgent.Stats(3, 3, 1, 0, 2)
+
+
+def test_sink_skip_unchanged():
+    stats = NgsiAgent.Stats(4, 4, 4, 0, 0)
+    recorder = SinkRecorder()
+    sink = SinkSkipUnchanged(recorder)
+    sink.bind(stats)
+    sink.write('{"id": "Room1", "type": "Room", "temperature": {"value": 21, "type": "Number"}}')
+    sink.write({"type": "Room", "temperature": {"type": "Number", "value": 21}, "id": "Room1"})
+    sink.write('{"id": "Room1", "type": "Room", "temperature": {"value": 22, "type": "Number"}}')
+    sink.write('{"id": "Room1", "type": "Other", "temperature": {"value": 22, "type": "Number"}}')
+    assert len(recorder.records) == 3
+    assert stats == NgsiAgent.Stats(4, 4, 3, 0, 0, skipped_unchanged=1)
+
+
+def test_sink_skip_unchanged_ttl_and_lru():
+    recorder = SinkRecorder()
+    sink = SinkSkipUnchanged(recorder, max_entries=1, ttl=0.05)
+    sink.write('{"id": "Room1", "type": "Room"}')
+    sink.write('{"id": "Room1", "type": "Room"}')
+    assert len(recorder.records) == 1
+    time.sleep(0.05)
+    sink.write('{"id": "Room1", "type": "Room"}')  # forced refresh
+    assert len(recorder.records) == 2
+    sink.write('{"id": "Room2", "type": "Room"}')  # evicts Room1
+    sink.write('{"id": "Room1", "type": "Room"}')
+    assert len(recorder.records) == 4
+
+
+def test_sink_skip_unchanged_persistence(tmp_path):
+    filename = str(tmp_path / "cache.json")
+    recorder = SinkRecorder()
+    sink = SinkSkipUnchanged(recorder, filename=filename)
+    sink.write('{"id": "Room1", "type": "Room"}')
+    sink.close()
+    sink = SinkSkipUnchanged(recorder, filename=filename)
+    sink.write('{"id": "Room1", "type": "Room"}')
+    assert len(recorder.records) == 1
@@ -2,12 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import json
+import pytest
 import pkg_resources
 
 from typing import List
 
 from pyngsi.sources.source import Row, Source
-from pyngsi.sources.source_json import SourceJson
+from pyngsi.sources.source_json import SourceJson, SourceJsonStream
 
 
 def test_source_json(mocker):
@@ -52,3 +54,65 @@ def test_source_json_path(mocker):
     assert rows[0].record["fruit"] == "Apple"
     assert rows[1].provider == "test.json"
     assert rows[1].record["fruit"] == "Lime"
+
+
+class ChunkedStream:
+    """A text stream that tells how much has been read"""
+
+    def __init__(self, data: str):
+        self.data = data
+        self.offset = 0
+
+    def read(self, size: int = -1) -> str:
+        size = len(self.data) if size < 0 else size
+        chunk = self.data[self.offset:self.offset+size]
+        self.offset += len(chunk)
+        return chunk
+
+
+def test_source_json_stream_incremental():
+    data = "[" + ",".join(json.dumps({"id": i, "values": [i] * 10, "name": f"n{i}"})
+                          for i in range(1000)) + "]"
+    stream = ChunkedStream(data)
+    src = SourceJsonStream(stream, chunk_size=64)
+    it = iter(src)
+    row = next(it)
+    assert row.record == {"id": 0, "values": [0] * 10, "name": "n0"}
+    assert stream.offset < 256
+    rows = [row] + list(it)
+    assert [r.record["id"] for r in rows] == list(range(1000))
+
+
+def test_source_json_stream_path():
+    data = r"""{"meta": {"count": 2, "tags": ["a", "b"]}, "dataset": {"info": 12.5e3, "data": [ {"fruit": "Apple"},
+    {"fruit": "Lime"} ], "other": [1, 2] } }"""
+    src = SourceJsonStream(ChunkedStream(data), jsonpath="dataset.data", chunk_size=7)
+    assert [r.record for r in src] == [{"fruit": "Apple"}, {"fruit": "Lime"}]
+    src = SourceJsonStream(ChunkedStream(data), jsonpath="dataset.info", chunk_size=3)
+    assert [r.record for r in src] == [12.5e3]
+    src = SourceJsonStream(ChunkedStream(data), jsonpath="dataset.missing")
+    assert [r.record for r in src] == [None]
+
+
+def test_source_json_stream_same_as_source_json():
+    data = r"""[1, "two", {"three": 3}, [4], null, true, 6.5e-3 ]"""
+    expected = [r.record for r in SourceJson(json.loads(data))]
+    for chunk_size in (1, 2, 5, 100):
+        src = SourceJsonStream(ChunkedStream(data), chunk_size=chunk_size)
+        assert [r.record for r in src] == expected
+
+
+def test_source_json_stream_truncated():
+    src = SourceJsonStream(ChunkedStream(r"""[{"fruit": "Apple"}, {"fruit": "Li"""))
+    with pytest.raises(json.JSONDecodeError):
+        list(src)
+
+
+def test_source_ndjson(mocker):
+    input_data = '{"fruit": "Apple"}\n\n{"fruit": "Lime"}\n'
+    mock_open = mocker.mock_open(read_data=input_data)
+    mocker.patch("builtins.open", mock_open)
+    src = Source.from_file("test.jsonl")
+    rows: List[Row] = [x for x in src]
+    assert rows == [Row("test.jsonl", {"fruit": "Apple"}),
+                    Row("test.jsonl", {"fruit": "Lime"})]
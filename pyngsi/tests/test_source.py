@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import gzip
+import pytest
 import pkg_resources
 
 from typing import List
 
-from pyngsi.sources.source import Row, Source, SourceStream, SourceStdin, SourceSingle
+from pyngsi.sources.source import Row, Source, SourceStream, SourceStdin, SourceSingle, SourceParallel, SourceFiles
 from pyngsi.sources.more_sources import SourceSampleOrion
 
 
@@ -95,3 +97,74 @@ def test_source_file_zip():
     rows: List[Row] = [x for x in src]
     assert rows == [Row('test.txt.zip', 'input5'),
                     Row('test.txt.zip', 'input6')]
+
+
+@pytest.fixture
+def many_files(tmp_path):
+    filenames = []
+    for i in range(6):
+        filename = tmp_path / f"file{i}.txt.gz"
+        with gzip.open(filename, "wt") as f:
+            f.writelines(f"line{i}-{j}\n" for j in range(25))
+        filenames.append(str(filename))
+    return filenames
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_source_parallel(many_files, processes):
+    src = SourceParallel(many_files, workers=3,
+                         processes=processes, chunksize=4, queue_size=2)
+    rows: List[Row] = [x for x in src]
+    assert len(rows) == 150
+    for i in range(6):  # rows of a same file keep their order
+        records = [r.record for r in rows if r.provider == f"file{i}.txt.gz"]
+        assert records == [f"line{i}-{j}" for j in range(25)]
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_source_parallel_ordered(many_files, processes):
+    src = SourceParallel(many_files, workers=3,
+                         processes=processes, ordered=True, chunksize=4, queue_size=2)
+    rows: List[Row] = [x for x in src]
+    assert [r.record for r in rows] == [
+        f"line{i}-{j}" for i in range(6) for j in range(25)]
+
+
+def test_source_parallel_missing_file(many_files):
+    src = SourceParallel(["missing.txt", *many_files[:2]],
+                         workers=2, processes=False, ordered=True)
+    rows: List[Row] = [x for x in src]
+    assert len(rows) == 50
+
+
+def test_source_parallel_stop_early(many_files):
+    src = SourceParallel(many_files, workers=2, processes=False,
+                         chunksize=1, queue_size=1)
+    assert len(src.head(3)) == 3
+
+
+def test_source_glob_parallel(many_files, tmp_path):
+    src = Source.from_glob(str(tmp_path / "*.gz"), workers=2)
+    assert isinstance(src, SourceParallel)
+    assert len([x for x in src]) == 150
+
+
+def test_source_files_lazy(many_files, mocker):
+    spy = mocker.spy(Source, "from_file")
+    src = Source.from_files(many_files)
+    assert isinstance(src, SourceFiles)
+    assert spy.call_count == 0
+    rows = iter(src)
+    assert next(rows) == Row("file0.txt.gz", "line0-0")
+    assert spy.call_count == 1
+    first = spy.spy_return
+    assert len([x for x in rows]) == 149
+    assert spy.call_count == 6
+    assert first.stream.closed  # each file is closed once read
+    assert spy.spy_return.stream.closed
+
+
+def test_source_globs(many_files, tmp_path):
+    src = Source.from_globs(
+        [str(tmp_path / "file[0-1]*"), str(tmp_path / "file5*")])
+    assert len([x for x in src]) == 75
@@ -1,8 +1,13 @@
 #!/usr/bin/env python3
 
+import json
 import pandas as pd
 
-from pyngsi.sources.more_sources import SourceDataFrame
+from datetime import datetime
+
+from pyngsi.ngsi import DataModel
+from pyngsi.template import EntityTemplate
+from pyngsi.sources.more_sources import SourceDataFrame, SourceDataFrameNgsi
 
 
 def test_source():
@@ -27,3 +32,57 @@ def test_source():
     assert rows[2].record.Index == 2
     assert rows[2].record.calories == 390
     assert rows[2].record.duration == 45
+
+
+def test_source_ngsi():
+    df = pd.DataFrame({
+        "room": ["Room1", "Room2", "Room3"],
+        "temperature": [21.5, None, 1e-05],
+        "pressure": [720, 711, 700],
+        "occupied": [True, False, True],
+        "name": ["Salle \"A\"", "Bâtiment B", None],
+        "date": pd.to_datetime(["2021-07-23 12:00:00", "2021-07-23 13:00:00", None]),
+        "lat": [44.83333333, 44.8, 44.7],
+        "lon": [-0.5667, -0.5, -0.4],
+        "tags": [["a"], ["b"], []]
+    })
+    tpl = EntityTemplate("Room")
+    tpl.add("temperature", "Number", metadata={"unitCode": {"value": "CEL"}})
+    tpl.add("pressure", "Number")
+    tpl.add("occupied", "Boolean")
+    tpl.add("name", "Text")
+    tpl.add("dateObserved", "DateTime")
+    tpl.add("location", "geo:json")
+    tpl.add("tags", "Array")
+    src = SourceDataFrameNgsi(df, tpl, id="room", batch_size=2,
+                              columns={"dateObserved": "date", "location": ("lat", "lon")})
+    rows = [row for row in src]
+    assert len(rows) == 3
+    assert rows[0].provider == "DataFrame"
+
+    m = DataModel("Room1", "Room")
+    m.add("temperature", 21.5, metadata={"unitCode": {"value": "CEL"}})
+    m.add("pressure", 720)
+    m.add("occupied", True)
+    m.add("name", "Salle \"A\"")
+    m.add("dateObserved", datetime(2021, 7, 23, 12, 0, 0))
+    m.add("location", (44.83333333, -0.5667))
+    m.add("tags", ["a"])
+    assert rows[0].record == m.json()
+
+    entity = json.loads(rows[1].record)
+    assert entity["temperature"]["value"] is None
+    assert entity["name"]["value"] == "Bâtiment B"
+    entity = json.loads(rows[2].record)
+    assert entity["temperature"]["value"] == 1e-05
+    assert entity["name"]["value"] is None
+    assert entity["dateObserved"]["value"] is None
+
+
+def test_source_ngsi_batches():
+    df = pd.DataFrame({"id": [f"Room{i}" for i in range(5)], "pressure": range(5)})
+    tpl = EntityTemplate("Room").add("pressure", "Number")
+    src = SourceDataFrameNgsi(df, tpl, id="id", batch_size=2)
+    batches = list(src.batches())
+    assert [len(b) for b in batches] == [2, 2, 1]
+    assert batches[2][0] == r'{"id": "Room4", "type": "Room", "pressure": {"value": 4, "type": "Number"}}'
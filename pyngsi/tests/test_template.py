@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from datetime import datetime
+from geojson import Point
+
+from pyngsi.ngsi import DataModel, NgsiError, NgsiRestrictionViolationError
+from pyngsi.template import EntityTemplate
+
+
+def test_builder_same_json_as_datamodel():
+    tpl = EntityTemplate("Room")
+    tpl.add("temperature", "Number", metadata={"unitCode": {"value": "CEL"}})
+    tpl.add("pressure", "Number")
+    tpl.add("occupied", "Boolean")
+    tpl.add("name", "Text")
+    tpl.add("dateObserved", "DateTime")
+    tpl.add("location", "geo:json")
+    tpl.add("source", "URL")
+    tpl.add("comment", "STRING_URL_ENCODED")
+    tpl.add("tags", "Array")
+    tpl.add_relationship("refBuilding")
+    build = tpl.compile()
+
+    now = datetime(2021, 7, 23, 12, 0, 0)
+    m = DataModel("Room1", "Room")
+    m.add("temperature", 21.7, metadata={"unitCode": {"value": "CEL"}})
+    m.add("pressure", 720)
+    m.add("occupied", False)
+    m.add("name", "Salle 100% \"café\"")
+    m.add("dateObserved", now)
+    m.add("location", (44.83333333, -0.5667))
+    m.add_url("source", "https://www.fiware.org")
+    m.add("comment", "<hello>", urlencode=True)
+    m.add("tags", ["a", "b"])
+    m.add_relationship("refBuilding", "urn:ngsi-ld:Building", "B1")
+
+    values = (21.7, 720, False, "Salle 100% \"café\"", now, (44.83333333, -0.5667),
+              "https://www.fiware.org", "<hello>", ["a", "b"], "urn:ngsi-ld:Building:B1")
+    assert build("Room1", *values) == m.json()
+    assert build("Room1", **dict(zip(tpl.names, values))) == m.json()
+
+
+def test_builder_geojson_point():
+    build = EntityTemplate("Place").add("location", "geo:json").compile()
+    m = DataModel("Place1", "Place")
+    m.add("location", Point((-0.5667, 44.8333)))
+    assert build("Place1", Point((-0.5667, 44.8333))) == m.json()
+
+
+def test_builder_bad_values():
+    build = EntityTemplate("Room").add("temperature", "Number").compile()
+    with pytest.raises(NgsiError, match=r".*Expected 1 values.*"):
+        build("Room1")
+    with pytest.raises(NgsiError, match=r".*Missing value.*"):
+        build("Room1", pressure=1)
+    with pytest.raises(NgsiError, match=r".*Cannot build entity.*"):
+        build("Room1", "hot")
+
+
+def test_template_strict():
+    tpl = EntityTemplate("Room", strict=True)
+    with pytest.raises(NgsiRestrictionViolationError):
+        tpl.add("id", "Text")
+    with pytest.raises(NgsiError, match=r".*Bad relationship.*"):
+        tpl.add_relationship("building")
+
+
+def test_template_duplicate():
+    tpl = EntityTemplate("Room").add("temperature", "Number")
+    with pytest.raises(NgsiError, match=r".*already declared.*"):
+        tpl.add("temperature", "Number")
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""
+Bounded queues between the stages of a pipelined agent.
+
+When a queue is full, the backpressure policy decides what happens to the new item :
+- block : put() waits for the consumer to free a slot
+- drop-oldest : the oldest item is dropped to make room
+- spill : the item is appended to a file on disk, and read back once the items in memory are consumed
+
+Items keep their order whatever the policy.
+"""
+
+import os
+import pickle
+import tempfile
+import threading
+
+from collections import deque
+from loguru import logger
+from typing import Any
+
+BLOCK = "block"
+DROP_OLDEST = "drop-oldest"
+SPILL = "spill"
+POLICIES = (BLOCK, DROP_OLDEST, SPILL)
+
+
+class QueueClosed(Exception):
+    pass
+
+
+class BackpressureQueue:
+    """
+    A BackpressureQueue is a FIFO queue holding up to maxsize items in memory.
+
+    The producer calls close() once done. get() raises QueueClosed when the queue is closed and empty.
+    """
+
+    def __init__(self, maxsize: int = 1000, policy: str = BLOCK, spill_dir: str = None):
+        if policy not in POLICIES:
+            raise ValueError(
+                f"Unknown backpressure policy {policy}. Available policies : {POLICIES}")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.dropped = 0  # items dropped
+        self.spilled = 0  # items spilled to disk
+        self._items = deque()
+        self._spill = None  # the spill file, opened on first use
+        self._spill_pending = 0  # items in the spill file not read yet
+        self._read_offset = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return len(self._items) + self._spill_pending
+
+    def put(self, item: Any):
+        with self._cond:
+            if self._spill_pending or len(self._items) >= self.maxsize:
+                if self.policy == BLOCK:
+                    while len(self._items) >= self.maxsize:
+                        self._cond.wait()
+                elif self.policy == DROP_OLDEST:
+                    self._items.popleft()
+                    self.dropped += 1
+                else:
+                    self._spill_item(item)
+                    self._cond.notify()
+                    return
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get(self) -> Any:
+        with self._cond:
+            while not self._items and not self._spill_pending:
+                if self._closed:
+                    raise QueueClosed()
+                self._cond.wait()
+            if self._items:
+                item = self._items.popleft()
+            else:
+                item = self._unspill_item()
+            self._cond.notify_all()
+            return item
+
+    def close(self):
+        """Signals the consumer that no more item will be put"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def gauges(self) -> dict:
+        with self._cond:
+            return {"depth": len(self), "maxsize": self.maxsize, "policy": self.policy,
+                    "dropped": self.dropped, "spilled": self.spilled, "spill_pending": self._spill_pending}
+
+    def _spill_item(self, item: Any):
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(
+                prefix="pyngsi-spill-", dir=self.spill_dir)
+            logger.warning("queue full : spill items to disk")
+        self._spill.seek(0, os.SEEK_END)
+        pickle.dump(item, self._spill)
+        self._spill_pending += 1
+        self.spilled += 1
+
+    def _unspill_item(self) -> Any:
+        self._spill.seek(self._read_offset)
+        item = pickle.load(self._spill)
+        self._read_offset = self._spill.tell()
+        self._spill_pending -= 1
+        if not self._spill_pending:  # reclaim disk space
+            self._spill.seek(0)
+            self._spill.truncate()
+            self._read_offset = 0
+        return item
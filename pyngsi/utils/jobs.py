@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""
+Asynchronous jobs run by a pool of worker threads.
+
+Jobs wait in a bounded queue : submit() rejects a job when the queue is full, so that the caller can answer
+"try again later" instead of piling up work. Finished jobs are kept for a while to let clients poll their result.
+"""
+
+import uuid
+import queue
+import threading
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from loguru import logger
+from typing import Any, Callable
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+@dataclass
+class Job:
+    """A Job calls func(job). Its result is stored as the job statistics."""
+
+    func: Callable = field(repr=False)
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    state: str = PENDING
+    submitted: datetime = field(default_factory=datetime.now)
+    started: datetime = None
+    finished: datetime = None
+    stats: Any = None  # may be updated by func while running, to report progress
+    error: str = None
+
+    def to_dict(self) -> dict:
+        return {"id": self.id, "state": self.state, "submitted": self.submitted,
+                "started": self.started, "finished": self.finished,
+                "statistics": self.stats, "error": self.error}
+
+
+class JobQueue:
+    """
+    A JobQueue runs the submitted jobs in workers threads, in the order of submission.
+
+    At most maxsize jobs wait to be run. The last max_finished finished jobs are kept.
+    """
+
+    def __init__(self, workers: int = 2, maxsize: int = 16, max_finished: int = 1000):
+        self.workers = workers
+        self.maxsize = maxsize
+        self.max_finished = max_finished
+        self.jobs = OrderedDict()  # pending and running jobs, then finished jobs
+        self.done = 0
+        self.failed = 0
+        self.rejected = 0
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._threads = [threading.Thread(target=self._work, daemon=True)
+                         for _ in range(workers)]
+        for t in self._threads:
+            t.start()
+
+    def submit(self, func: Callable) -> Job:
+        """Queues a job calling func(job). Raises JobQueueFull if the queue is full."""
+        job = Job(func)
+        with self._lock:
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                self.rejected += 1
+                raise JobQueueFull(
+                    f"too many pending jobs ({self.maxsize})") from None
+            self.jobs[job.id] = job
+        logger.info(f"job {job.id} queued")
+        return job
+
+    def get(self, id: str) -> Job:
+        with self._lock:
+            return self.jobs.get(id)
+
+    def close(self):
+        """Runs the pending jobs then stops the workers"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+
+    def gauges(self) -> dict:
+        with self._lock:
+            running = sum(1 for job in self.jobs.values()
+                          if job.state == RUNNING)
+            return {"pending": self._queue.qsize(), "running": running, "maxsize": self.maxsize,
+                    "workers": self.workers, "done": self.done, "failed": self.failed,
+                    "rejected": self.rejected}
+
+    def _work(self):
+        while (job := self._queue.get()) is not None:
+            logger.info(f"job {job.id} started")
+            job.started = datetime.now()
+            job.state = RUNNING
+            try:
+                job.stats = job.func(job)
+                job.state = DONE
+            except Exception as e:
+                logger.error(f"job {job.id} failed : {e}")
+                job.error = str(e)
+                job.state = FAILED
+            job.finished = datetime.now()
+            logger.info(f"job {job.id} {job.state}")
+            with self._lock:
+                if job.state == DONE:
+                    self.done += 1
+                else:
+                    self.failed += 1
+                self.jobs.move_to_end(job.id)  # finished jobs are the last ones
+                self._evict()
+
+    def _evict(self):
+        finished = sum(1 for job in self.jobs.values()
+                       if job.state in (DONE, FAILED))
+        for id in list(self.jobs):
+            if finished <= self.max_finished:
+                break
+            if self.jobs[id].state in (DONE, FAILED):
+                del self.jobs[id]
+                finished -= 1
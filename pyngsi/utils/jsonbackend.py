@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+"""
+JSON serialization backends used to serialize NGSI entities.
+
+A backend is a function dumps(obj, default) -> str.
+The default backend relies on the json module of the standard library.
+The orjson backend is available when the orjson package is installed (pip install pyngsi[fast]).
+Its output is compact : no whitespace after separators.
+Other backends can be registered thanks to register_backend().
+"""
+
+import json
+
+from functools import lru_cache
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+Dumps = Callable[[Any, Callable], str]
+
+
+@lru_cache(maxsize=32)
+def _encoder(default: Callable) -> Callable[[Any], str]:
+    # json.dumps() instantiates a new JSONEncoder at each call when given non-default options
+    return json.JSONEncoder(ensure_ascii=False, default=default).encode
+
+
+def dumps_json(obj: Any, default: Callable = str) -> str:
+    return _encoder(default)(obj)
+
+
+def dumps_orjson(obj: Any, default: Callable = str) -> str:
+    try:
+        # datetimes go through default to get the same output as the json backend
+        return orjson.dumps(obj, default=default, option=orjson.OPT_PASSTHROUGH_DATETIME).decode("utf-8")
+    except orjson.JSONEncodeError:  # i.e. non-str keys, integers over 64 bits
+        return dumps_json(obj, default)
+
+
+_backends = {"json": dumps_json}
+if orjson:
+    _backends["orjson"] = dumps_orjson
+
+
+def register_backend(name: str, dumps: Dumps):
+    _backends[name] = dumps
+
+
+def available_backends():
+    return list(_backends)
+
+
+def get_backend(name: str = "json") -> Dumps:
+    """Returns the backend given its name. 'auto' selects the fastest backend installed."""
+    if name == "auto":
+        return _backends.get("orjson", dumps_json)
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown JSON backend {name}. Available backends : {available_backends()}")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+Latency histograms of the stages of an agent.
+
+A histogram counts durations in log-linear buckets : 8 buckets per power of two.
+Recording a duration costs about a microsecond and memory does not grow with the number of samples.
+Percentiles are estimated within a 6% relative error.
+"""
+
+import math
+import threading
+
+from typing import Dict
+
+SUB_BUCKETS = 8
+
+# the instrumented stages of an agent
+SOURCE_NEXT = "source_next"
+PROCESS = "process"
+SERIALIZE = "serialize"
+SINK_WRITE = "sink_write"
+SIDE_EFFECT = "side_effect"
+STAGES = (SOURCE_NEXT, PROCESS, SERIALIZE, SINK_WRITE, SIDE_EFFECT)
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        m, e = math.frexp(max(seconds, 1e-9))  # seconds = m * 2**e, 0.5 <= m < 1
+        bucket = e * SUB_BUCKETS + int(m * 2 * SUB_BUCKETS) - SUB_BUCKETS
+        with self._lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    @staticmethod
+    def _value(bucket: int) -> float:
+        """Returns the middle of the bucket"""
+        e, j = divmod(bucket, SUB_BUCKETS)
+        return math.ldexp((SUB_BUCKETS + j + 0.5) / (2 * SUB_BUCKETS), e)
+
+    def percentile(self, p: float) -> float:
+        """Returns the estimated p-th percentile in seconds"""
+        with self._lock:
+            rank = p / 100 * self.count
+            seen = 0
+            for bucket in sorted(self.counts):
+                seen += self.counts[bucket]
+                if seen >= rank:
+                    return min(self._value(bucket), self.max)
+            return 0.0
+
+    def to_dict(self) -> dict:
+        """Returns the count and the mean, p50, p95, p99 and max durations in milliseconds"""
+        return {"count": self.count,
+                "mean": round(1000 * self.total / self.count, 3) if self.count else 0.0,
+                "p50": round(1000 * self.percentile(50), 3),
+                "p95": round(1000 * self.percentile(95), 3),
+                "p99": round(1000 * self.percentile(99), 3),
+                "max": round(1000 * self.max, 3)}
+
+
+class StageLatency:
+    """The latency histograms of the stages of an agent"""
+
+    def __init__(self):
+        self.histograms = {stage: LatencyHistogram() for stage in STAGES}
+
+    def record(self, stage: str, seconds: float):
+        self.histograms[stage].record(seconds)
+
+    def to_dict(self) -> dict:
+        return {stage: h.to_dict() for stage, h in self.histograms.items()}
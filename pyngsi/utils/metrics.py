@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+
+"""
+Metrics in the Prometheus text exposition format.
+
+https://prometheus.io/docs/instrumenting/exposition_formats/
+
+Also provides the CachedStatus, that keeps the status of a remote server (i.e. Orion) up to date in the background.
+Hence scraping the metrics never waits for the remote server.
+"""
+
+import time
+import threading
+
+from dataclasses import fields
+from loguru import logger
+from typing import Callable
+
+PREFIX = "pyngsi"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metrics:
+    """Collects samples then renders them in the Prometheus text format"""
+
+    def __init__(self, prefix: str = PREFIX):
+        self.prefix = prefix
+        self.lines = []
+        self._declared = set()
+
+    def add(self, name: str, type: str, help: str, value: float, labels: dict = None, suffix: str = ""):
+        """Adds a sample. Samples of a same metric must be added one after the other."""
+        name = f"{self.prefix}_{name}"
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help}")
+            self.lines.append(f"# TYPE {name} {type}")
+        if labels:
+            labels = ",".join(f'{k}="{v}"' for k, v in labels.items())
+            self.lines.append(f"{name}{suffix}{{{labels}}} {value}")
+        else:
+            self.lines.append(f"{name}{suffix} {value}")
+
+    def add_stats(self, stats):
+        """Adds the agent statistics as counters"""
+        for f in fields(stats):
+            self.add(f"agent_{f.name}_total", "counter",
+                     f"agent statistics : {f.name}", getattr(stats, f.name))
+
+    def add_calls(self, status):
+        """Adds the call counters of a server or scheduler status"""
+        self.add("start_time_seconds", "gauge", "start time since epoch",
+                 status.starttime.timestamp() if status.starttime else 0)
+        self.add("calls_total", "counter", "calls received",
+                 status.calls)
+        self.add("calls_success_total", "counter", "calls successfully processed",
+                 status.calls_success)
+        self.add("calls_error_total", "counter", "calls in error",
+                 status.calls_error)
+
+    def add_latency(self, latency):
+        """Adds the latency histograms of the agent stages as summaries"""
+        if not latency:
+            return
+        name, help = "stage_latency_seconds", "latency of the agent stages"
+        for stage, h in latency.histograms.items():
+            for q in (0.5, 0.95, 0.99):
+                self.add(name, "summary", help, h.percentile(100 * q),
+                         {"stage": stage, "quantile": q})
+        for stage, h in latency.histograms.items():
+            self.add(name, "summary", help, h.total, {"stage": stage}, "_sum")
+        for stage, h in latency.histograms.items():
+            self.add(name, "summary", help, h.count, {"stage": stage}, "_count")
+
+    def add_queues(self, queues: dict):
+        """Adds the gauges of the queues of a pipelined agent"""
+        if not queues:
+            return
+        for metric, help in (("depth", "items in the queue"),
+                             ("dropped", "items dropped by the queue"),
+                             ("spilled", "items spilled to disk by the queue")):
+            for name, q in queues.items():
+                self.add(f"queue_{metric}", "gauge", help,
+                         q.gauges()[metric], {"queue": name})
+
+    def add_jobs(self, gauges: dict):
+        """Adds the gauges and counters of the asynchronous jobs of a server"""
+        self.add("jobs_pending", "gauge", "jobs waiting for a worker",
+                 gauges["pending"])
+        self.add("jobs_running", "gauge", "jobs being processed",
+                 gauges["running"])
+        for state in ("done", "failed", "rejected"):
+            self.add("jobs_total", "counter", "jobs by final state",
+                     gauges[state], {"state": state})
+
+    def add_remote_status(self, status: dict):
+        """Adds the state of the remote server, and of the spool if any, given the sink status"""
+        up = 1 if status and status.get("state") != "Down or Unreachable" else 0
+        self.add("remote_up", "gauge", "remote server reachable", up)
+        if status and (spool := status.get("spool")):
+            self.add("spool_pending", "gauge", "records in the spool",
+                     spool["pending"])
+            self.add("spool_bytes", "gauge", "size of the spool",
+                     spool["bytes"])
+            self.add("spool_lag_seconds", "gauge", "age of the oldest record in the spool",
+                     spool["lag"])
+
+    def text(self) -> str:
+        return "\n".join(self.lines) + "\n"
+
+
+class CachedStatus:
+    """
+    A CachedStatus calls a status function in the background, every interval seconds.
+
+    get() returns the last status without blocking. It is None until the first call completes.
+    """
+
+    def __init__(self, func: Callable, interval: float = 30.0):
+        self.func = func
+        self.interval = interval
+        self.value = None
+        self.updated = None  # time of the last refresh since epoch
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            if self._thread is None:  # start on first use
+                self._thread = threading.Thread(
+                    target=self._refresh, daemon=True)
+                self._thread.start()
+        return self.value
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh(self):
+        while True:
+            try:
+                self.value = self.func()
+                self.updated = time.time()
+            except Exception as e:
+                logger.error(f"Cannot refresh status : {e}")
+            if self._stop.wait(self.interval):
+                break
@@ -30,6 +30,7 @@ setuptools.setup(
     install_requires=["loguru", "requests", "requests-toolbelt", "shortuuid",
                       "more_itertools", "geojson", "flask", "cherrypy", "schedule",
                       "defusedxml", "openpyxl", "paho-mqtt", "pyyaml", "pandas"],
+    extras_require={"fast": ["orjson"], "async": ["aiohttp"]},
     test_requires=["pytest", "pytest-mock", "requests-mock", "pytest-flask"],
     python_requires=">=3.8"
 )